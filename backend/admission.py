@@ -0,0 +1,329 @@
+"""
+Admission - Load shedding and cancellation for /api/generate.
+Caps concurrent generations per process, lets a short queue wait for a slot,
+and past that either rejects (503 + Retry-After) or degrades the request to
+template mode. Per-API-key quotas (429) keep one caller from taking every
+slot. Requests whose client has hung up are cancelled before their next LLM call.
+"""
+
+import math
+import os
+import select
+import socket
+import threading
+import time
+from contextvars import ContextVar
+
+from metrics import inc, observe
+from structured_logging import get_logger
+
+log = get_logger("admission")
+
+# Generations running at once per process (0 disables admission control).
+# Keep ADMISSION_MAX_INFLIGHT + ADMISSION_MAX_QUEUE <= GUNICORN_THREADS so
+# excess load is answered here instead of waiting in gunicorn's accept queue.
+MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "12"))
+# Requests allowed to wait for a slot, and for how long
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "4"))
+MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "5"))
+# "degrade" serves template copy when full; "reject" answers 503
+OVERLOAD_POLICY = os.getenv("ADMISSION_OVERLOAD", "degrade")
+# Generations one API key may have running or queued (0 = no per-key limit)
+KEY_LIMIT = int(os.getenv("ADMISSION_KEY_LIMIT", "0"))
+
+# Seed for the service-time estimate behind Retry-After
+DEFAULT_SERVICE_SECONDS = 3.0
+EWMA_ALPHA = 0.2
+MAX_RETRY_AFTER = 60
+
+_cancel_token = ContextVar("cancel_token", default=None)
+
+
+class RequestCancelled(BaseException):
+    """
+    The client went away. A BaseException (like asyncio.CancelledError) so the
+    generic `except Exception` fallbacks along the way don't turn it into
+    template work nobody will read.
+    """
+
+
+class Rejected(Exception):
+    """Admission refused: `status` is 429 (key quota) or 503 (overloaded)."""
+
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# ============ CANCELLATION ============
+
+class CancelToken:
+    """Set once the request's client disconnects."""
+
+    __slots__ = ("_event",)
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+
+
+def raise_if_cancelled():
+    """Call between stages: stops work for a request whose client has gone."""
+    token = _cancel_token.get()
+    if token is not None and token.cancelled:
+        raise RequestCancelled("client disconnected")
+
+
+class DisconnectMonitor:
+    """
+    One thread per process polling the sockets of admitted requests. A socket
+    that turns readable with nothing to read (peeked, never consumed) means
+    the client closed the connection, and its token is cancelled.
+    """
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._watched = {}
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def watch(self, sock, token):
+        if sock is None:
+            return
+        with self._lock:
+            self._watched[sock] = token
+            if self._thread is None or self._pid != os.getpid():
+                # (Re)start after fork - threads don't survive it
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="disconnect-monitor", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def unwatch(self, sock):
+        with self._lock:
+            self._watched.pop(sock, None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                watched = dict(self._watched)
+            if not watched:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            poller = select.poll()
+            by_fd = {}
+            for sock, token in watched.items():
+                fd = sock.fileno()
+                if fd < 0:
+                    # Closed under us (request finished mid-poll)
+                    self.unwatch(sock)
+                    continue
+                by_fd[fd] = (sock, token)
+                poller.register(fd, select.POLLIN | select.POLLHUP | select.POLLERR)
+            readable = poller.poll(self.interval * 1000)
+            for fd, _ in readable:
+                sock, token = by_fd[fd]
+                if self._closed(sock):
+                    token.cancel()
+                    self.unwatch(sock)
+                    inc("copygen_admission_total", decision="cancelled", reason="client_disconnected")
+            if readable:
+                # Pipelined bytes keep a live socket readable; don't spin on it
+                time.sleep(self.interval)
+
+    @staticmethod
+    def _closed(sock):
+        try:
+            return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b""
+        except BlockingIOError:
+            return False
+        except ValueError:
+            # TLS sockets can't peek; treat as alive
+            return False
+        except OSError:
+            return True
+
+
+# ============ ADMISSION ============
+
+class Ticket:
+    """
+    An admitted request. Use as a context manager around the generation: it
+    binds the cancel token, watches the client socket and frees the slot.
+    `degraded` means serve template copy (no LLM calls).
+    """
+
+    def __init__(self, controller, key, degraded, sock):
+        self.controller = controller
+        self.key = key
+        self.degraded = degraded
+        self.token = CancelToken()
+        self._sock = sock
+        self._reset = None
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        self._reset = _cancel_token.set(self.token)
+        self.controller.monitor.watch(self._sock, self.token)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.controller.monitor.unwatch(self._sock)
+        _cancel_token.reset(self._reset)
+        self.controller.release(self, time.monotonic() - self._start)
+        return False
+
+
+class AdmissionController:
+    """
+    Per-process in-flight and queue accounting. Waiters are woken in turn as
+    slots free up; anyone still waiting after `max_wait` is shed.
+    """
+
+    def __init__(self, max_inflight=MAX_INFLIGHT, max_queue=MAX_QUEUE, max_wait=MAX_WAIT,
+                 policy=OVERLOAD_POLICY, key_limit=KEY_LIMIT, monitor=None):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.policy = policy
+        self.key_limit = key_limit
+        self.monitor = monitor or DisconnectMonitor()
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._queued = 0
+        self._degraded = 0
+        self._per_key = {}
+        self._service_time = DEFAULT_SERVICE_SECONDS
+
+    @property
+    def enabled(self):
+        return self.max_inflight > 0
+
+    def retry_after(self):
+        """Seconds until a slot is likely free: queue ahead of you x mean generation time."""
+        slots = max(self.max_inflight, 1)
+        seconds = self._service_time * (self._queued + 1) / slots
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(seconds)))
+
+    def admit(self, key="anonymous", sock=None, deadline=None):
+        """
+        Return a Ticket, waiting up to max_wait for a slot (never past the
+        request's `deadline`); raises Rejected.
+        """
+        if not self.enabled:
+            return Ticket(self, None, False, sock)
+
+        start = time.monotonic()
+        with self._cond:
+            if self.key_limit and self._per_key.get(key, 0) >= self.key_limit:
+                return self._shed(429, "key_quota")
+            self._per_key[key] = self._per_key.get(key, 0) + 1
+
+            if self._inflight >= self.max_inflight:
+                if self._queued >= self.max_queue:
+                    return self._overloaded(key, "queue_full", sock)
+                self._queued += 1
+                try:
+                    max_wait = self.max_wait if deadline is None else min(self.max_wait, deadline.remaining())
+                    wait_until = start + max_wait
+                    while self._inflight >= self.max_inflight:
+                        remaining = wait_until - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._cond.wait(remaining)
+                finally:
+                    self._queued -= 1
+                if self._inflight >= self.max_inflight:
+                    return self._overloaded(key, "queue_timeout", sock)
+
+            self._inflight += 1
+
+        observe("copygen_stage_seconds", time.monotonic() - start, stage="admission_wait")
+        inc("copygen_admission_total", decision="admitted", reason="ok")
+        return Ticket(self, key, False, sock)
+
+    def _overloaded(self, key, reason, sock):
+        """Full: degrade to template mode or reject, per policy (caller holds the lock)."""
+        if self.policy == "degrade":
+            self._degraded += 1
+            inc("copygen_admission_total", decision="degraded", reason=reason)
+            return Ticket(self, key, True, sock)
+        self._release_key(key)
+        return self._shed(503, reason)
+
+    def _shed(self, status, reason):
+        inc("copygen_admission_total", decision="rejected", reason=reason)
+        log.warning("request shed", extra={"fields": {
+            "status": status, "reason": reason, "inflight": self._inflight, "queued": self._queued}})
+        raise Rejected(status, reason, self.retry_after())
+
+    def _release_key(self, key):
+        remaining = self._per_key.get(key, 0) - 1
+        if remaining > 0:
+            self._per_key[key] = remaining
+        else:
+            self._per_key.pop(key, None)
+
+    def release(self, ticket, elapsed):
+        if ticket.key is None:
+            return
+        with self._cond:
+            self._release_key(ticket.key)
+            if ticket.degraded:
+                self._degraded -= 1
+                return
+            self._inflight -= 1
+            if not ticket.token.cancelled:
+                self._service_time += EWMA_ALPHA * (elapsed - self._service_time)
+            self._cond.notify()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                "inflight": self._inflight,
+                "queued": self._queued,
+                "degraded": self._degraded,
+                "maxInflight": self.max_inflight,
+                "maxQueue": self.max_queue,
+                "policy": self.policy,
+                "serviceSeconds": round(self._service_time, 2),
+                "keys": len(self._per_key),
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission():
+    """Process-wide admission controller (configured from the environment)."""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController()
+    return _controller
+
+
+def set_admission(controller):
+    """Replace the process-wide controller (None rebuilds it from the environment)."""
+    global _controller
+    _controller = controller
+
+
+def client_socket(environ):
+    """The raw client socket under gunicorn or the Werkzeug dev server (None otherwise)."""
+    sock = environ.get("gunicorn.socket") or environ.get("werkzeug.socket")
+    return sock if isinstance(sock, socket.socket) else None
@@ -4,23 +4,55 @@ Serves both the API and static frontend files.
 """
 
 import os
-from flask import Flask, request, jsonify, send_from_directory
-from flask_cors import CORS
-from copy_engine import generate_copy
+from dotenv import load_dotenv
+
+# Before any backend import: modules read their settings from the environment at import time
+load_dotenv()
+
+from flask import Flask, Response, request, jsonify  # noqa: E402
+from flask_cors import CORS  # noqa: E402
+from admission import Rejected, RequestCancelled, client_socket, get_admission  # noqa: E402
+from copy_engine import generate_copy  # noqa: E402
+from deadline import Deadline  # noqa: E402
+from history_store import get_store  # noqa: E402
+from hook_stats import OUTCOME_EVENTS, get_index  # noqa: E402
+from metrics import inc, render_prometheus, timer  # noqa: E402
+from parse_pool import parse_inline  # noqa: E402
+from prefetch import get_prefetch_cache  # noqa: E402
+from profiling import ProfileBusy, is_authorized, load_profile, profile_call, save_profile  # noqa: E402
+from providers import DEFAULT_TIER, TIERS, get_router  # noqa: E402
+from refresh import start_background_refresh  # noqa: E402
+from static_assets import AssetManifest  # noqa: E402
+from structured_logging import bind_request_id, get_request_id  # noqa: E402
 
 # Get the parent directory where frontend files are
 FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
 
-app = Flask(__name__, static_folder=FRONTEND_DIR)
+app = Flask(__name__, static_folder=None)
 CORS(app)  # Enable CORS for frontend requests
 
+# Frontend files are hashed, compressed and held in memory at startup
+assets = AssetManifest(FRONTEND_DIR)
+
+
+@app.before_request
+def assign_request_id():
+    """Tag every log line for this request with a correlation ID."""
+    bind_request_id(request.headers.get('X-Request-ID', '')[:64])
+
+
+@app.after_request
+def expose_request_id(response):
+    response.headers['X-Request-ID'] = get_request_id()
+    return response
+
 
 # ============ FRONTEND ROUTES ============
 
 @app.route('/')
 def index():
     """Serve the main frontend page."""
-    return send_from_directory(FRONTEND_DIR, 'index.html')
+    return assets.serve('index.html', request)
 
 @app.route('/<path:path>')
 def static_files(path):
@@ -28,10 +60,7 @@ def static_files(path):
     # Don't serve API routes as static
     if path.startswith('api/'):
         return jsonify({"error": "Not found"}), 404
-    try:
-        return send_from_directory(FRONTEND_DIR, path)
-    except:
-        return send_from_directory(FRONTEND_DIR, 'index.html')
+    return assets.serve(path, request)
 
 
 # ============ API ROUTES ============
@@ -47,44 +76,303 @@ def generate():
         "industry": "SaaS",
         "audience": "Small Business Owners",
         "website": "https://acme.com",
-        "strategy": "Focus on automation pain points..."
+        "strategy": "Focus on automation pain points...",
+        "sequence": false,
+        "tier": "flash",
+        "seed": 42,
+        "sessionId": "..."
     }
+    
+    With `"sequence": true` each variation also carries follow-ups 1-3
+    under `followUps`. `"tier": "pro"` routes to the larger model. An integer
+    `seed` makes template output byte-identical for the same brief and runs
+    the LLM at temperature 0 with that seed. `sessionId` picks up the
+    website analysis started by /api/prefetch for the same session.
+    
+    Admission control: past the in-flight and queue limits the request is
+    served from templates (`"degraded": true`) or refused with 503, and an
+    `X-API-Key` over its quota gets 429 - both with Retry-After. Work stops
+    before the next LLM call if the client disconnects.
+    
+    `X-Request-Timeout` (seconds, default REQUEST_TIMEOUT) is the whole
+    request's budget, admission wait included. Stages share what's left and
+    degrade - no website scrape, a shorter prompt, template copy - rather
+    than overrun it.
+    
+    Add `?profile=1` (or `X-Profile: 1`) with a valid `X-Admin-Token` to run
+    the request under the profiler; the response then carries a `profile` link.
     """
     try:
+        # Start the clock before anything else, so queueing counts against it
+        try:
+            deadline = Deadline.from_header(request.headers.get('X-Request-Timeout'))
+        except ValueError:
+            inc("copygen_requests_total", endpoint="generate", status="400")
+            return jsonify({"error": "X-Request-Timeout must be a positive number of seconds"}), 400
+        
         data = request.get_json()
         
         # Validate required fields
         required = ['clientName', 'industry', 'website', 'strategy']
         missing = [f for f in required if not data.get(f)]
         if missing:
+            inc("copygen_requests_total", endpoint="generate", status="400")
             return jsonify({"error": f"Missing required fields: {', '.join(missing)}"}), 400
         
-        # Generate copy
-        result = generate_copy(
+        tier = data.get('tier') or DEFAULT_TIER
+        if tier not in TIERS:
+            inc("copygen_requests_total", endpoint="generate", status="400")
+            return jsonify({"error": f"tier must be one of {', '.join(TIERS)}"}), 400
+        
+        seed = data.get('seed')
+        if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+            inc("copygen_requests_total", endpoint="generate", status="400")
+            return jsonify({"error": "seed must be an integer"}), 400
+        
+        brief = dict(
             client_name=data.get('clientName'),
             industry=data.get('industry'),
             audience=data.get('audience', ''),
             website=data.get('website'),
-            strategy=data.get('strategy')
+            strategy=data.get('strategy'),
+            sequence=bool(data.get('sequence')),
+            tier=tier,
+            seed=seed,
+            session_id=str(data.get('sessionId') or '')[:64] or None,
+            deadline=deadline
         )
         
+        want_profile = request.args.get('profile') == '1' or request.headers.get('X-Profile') == '1'
+        if want_profile and not is_authorized(request.headers.get('X-Admin-Token')):
+            inc("copygen_requests_total", endpoint="generate", status="403")
+            return jsonify({"error": "Profiling requires a valid admin token"}), 403
+        
+        try:
+            ticket = get_admission().admit(request.headers.get('X-API-Key') or 'anonymous',
+                                           client_socket(request.environ), deadline)
+        except Rejected as e:
+            inc("copygen_requests_total", endpoint="generate", status=str(e.status))
+            return (jsonify({"error": "Too many requests, retry later", "reason": e.reason}), e.status,
+                    {"Retry-After": str(e.retry_after)})
+        if ticket.degraded:
+            brief["use_llm"] = False
+        
+        # Generate copy
+        with ticket, timer("request"):
+            if want_profile:
+                try:
+                    # Parse on this thread so the profile includes it
+                    with parse_inline():
+                        result, profile = profile_call(generate_copy, **brief)
+                    save_profile(profile)
+                    result["profile"] = {
+                        "id": profile["id"],
+                        "wallMs": profile["wall_ms"],
+                        "url": f"/api/profiles/{profile['id']}",
+                    }
+                except ProfileBusy as e:
+                    result = generate_copy(**brief)
+                    result["profile"] = {"error": str(e)}
+            else:
+                result = generate_copy(**brief)
+        
+        inc("copygen_requests_total", endpoint="generate", status="200")
         return jsonify(result)
     
+    except RequestCancelled:
+        # Nobody is listening; 499 is the de facto "client closed request" code
+        inc("copygen_requests_total", endpoint="generate", status="499")
+        return "", 499
     except Exception as e:
+        inc("copygen_requests_total", endpoint="generate", status="500")
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/prefetch', methods=['POST'])
+def prefetch():
+    """
+    Start analyzing a website in the background so /api/generate finds it ready.
+    
+    Expects JSON body: {"website": "https://acme.com", "sessionId": "..."}
+    Returns 202 with "status": started, pending or ready, or 429 (with
+    Retry-After) when too many fetches are pending overall or for the
+    caller's `X-API-Key`.
+    """
+    data = request.get_json(silent=True) or {}
+    website = data.get('website')
+    session_id = str(data.get('sessionId') or '')[:64]
+    if not website or not session_id:
+        inc("copygen_requests_total", endpoint="prefetch", status="400")
+        return jsonify({"error": "website and sessionId are required"}), 400
+    try:
+        status = get_prefetch_cache().start(website, session_id, request.headers.get('X-API-Key') or 'anonymous')
+    except Rejected as e:
+        inc("copygen_requests_total", endpoint="prefetch", status=str(e.status))
+        return (jsonify({"error": "Too many prefetches, retry later", "reason": e.reason}), e.status,
+                {"Retry-After": str(e.retry_after)})
+    inc("copygen_requests_total", endpoint="prefetch", status="202")
+    return jsonify({"status": status}), 202
+
+
+# ============ HISTORY ============
+
+@app.route('/api/history/generations', methods=['GET'])
+def list_generations():
+    """
+    Paginated generation history, newest first.
+    Query: client, industry, limit (max 100), cursor (from the previous page's nextCursor).
+    """
+    store = get_store()
+    if store is None:
+        return jsonify({"error": "History is disabled"}), 503
+    items, next_cursor = store.list_generations(
+        client=request.args.get('client'),
+        industry=request.args.get('industry'),
+        limit=request.args.get('limit', type=int),
+        cursor=request.args.get('cursor'),
+    )
+    return jsonify({"items": items, "nextCursor": next_cursor})
+
+
+@app.route('/api/history/generations/<generation_id>', methods=['GET'])
+def get_generation(generation_id):
+    """A single generation with its scraped context and variations."""
+    store = get_store()
+    if store is None:
+        return jsonify({"error": "History is disabled"}), 503
+    generation = store.get_generation(generation_id)
+    if generation is None:
+        return jsonify({"error": "Generation not found"}), 404
+    return jsonify(generation)
+
+
+@app.route('/api/history/variations', methods=['GET'])
+def list_variations():
+    """
+    Paginated variation history, newest first.
+    Query: client, industry, hookType, limit (max 100), cursor.
+    """
+    store = get_store()
+    if store is None:
+        return jsonify({"error": "History is disabled"}), 503
+    items, next_cursor = store.list_variations(
+        client=request.args.get('client'),
+        industry=request.args.get('industry'),
+        hook_type=request.args.get('hookType'),
+        limit=request.args.get('limit', type=int),
+        cursor=request.args.get('cursor'),
+    )
+    return jsonify({"items": items, "nextCursor": next_cursor})
+
+
+# ============ OUTCOMES ============
+
+@app.route('/api/outcomes', methods=['POST'])
+def ingest_outcomes():
+    """
+    Record send/open/reply outcomes for generated variations.
+    
+    Expects JSON body (single event or a batch):
+    {"variationId": "...", "event": "reply", "count": 1}
+    {"events": [{"variationId": "...", "event": "open"}, ...]}
+    """
+    store = get_store()
+    if store is None:
+        return jsonify({"error": "History is disabled"}), 503
+    
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    events = data.get('events') if isinstance(data.get('events'), list) else [data]
+    index = get_index()
+    recorded = 0
+    unknown = []
+    flushed = False
+    
+    # Validate the whole batch first, so a 400 records nothing
+    for event in events:
+        count = event.get('count', 1) if isinstance(event, dict) else None
+        if not isinstance(event, dict) or event.get('event') not in OUTCOME_EVENTS \
+                or not isinstance(event.get('variationId') or "", str) \
+                or not isinstance(count, int) or isinstance(count, bool) or count < 1:
+            return jsonify({"error": f"each event must be an object with a string variationId, event one "
+                                     f"of {', '.join(OUTCOME_EVENTS)} and a positive integer count"}), 400
+    
+    for event in events:
+        variation_id = event.get('variationId')
+        variation = store.get_variation(variation_id) if variation_id else None
+        if variation is None and variation_id and not flushed:
+            # It may still be sitting in the write-behind queue
+            store.flush()
+            flushed = True
+            variation = store.get_variation(variation_id)
+        if variation is None:
+            unknown.append(variation_id)
+            continue
+        index.record(variation["industry_key"], variation["audience"], variation["hook_type"],
+                     event['event'], event.get('count', 1))
+        recorded += 1
+    
+    return jsonify({"recorded": recorded, "unknown": unknown})
+
+
+@app.route('/api/outcomes/stats', methods=['GET'])
+def outcome_stats():
+    """Per-hook-type outcome counts for a segment. Query: industry, audience."""
+    return jsonify(get_index().segment(request.args.get('industry'), request.args.get('audience')))
+
+
+@app.route('/api/providers', methods=['GET'])
+def providers_status():
+    """Rolling latency, error rate and health of each configured LLM provider."""
+    return jsonify({"providers": get_router().snapshot()})
+
+
+@app.route('/api/admission', methods=['GET'])
+def admission_status():
+    """In-flight, queued and degraded generations in this worker, plus the limits."""
+    return jsonify(get_admission().snapshot())
+
+
 @app.route('/api/health', methods=['GET'])
 def health():
     """Health check endpoint."""
     return jsonify({"status": "ok"})
 
 
+@app.route('/api/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    """
+    Fetch a stored request profile (admin only).
+    ?format=collapsed (flamegraph input), pstats (text) or json (default).
+    """
+    if not is_authorized(request.headers.get('X-Admin-Token')):
+        return jsonify({"error": "Forbidden"}), 403
+    
+    profile = load_profile(profile_id)
+    if profile is None:
+        return jsonify({"error": "Profile not found"}), 404
+    
+    fmt = request.args.get('format', 'json')
+    if fmt == 'collapsed':
+        return Response(profile["collapsed"], mimetype="text/plain")
+    if fmt == 'pstats':
+        return Response(profile["pstats"], mimetype="text/plain")
+    return jsonify(profile)
+
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus scrape endpoint (aggregated across gunicorn workers)."""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5001))
     print(f"🚀 Psychic Copy Generator running on port {port}")
     print(f"   Frontend: http://localhost:{port}/")
     print(f"   API:      http://localhost:{port}/api/generate")
+    start_background_refresh()
     app.run(host='0.0.0.0', debug=False, port=port)
 
 
@@ -0,0 +1,23 @@
+"""
+ASGI entry point (optional) - serves the Flask app under an ASGI server.
+
+    pip install a2wsgi uvicorn
+    cd backend && uvicorn asgi:application --host 0.0.0.0 --port $PORT --workers 2
+
+The WSGI app runs on a2wsgi's thread pool, so the same I/O-bound sizing as
+gunicorn.conf.py applies: ASGI_THREADS concurrent generations per worker.
+(asgiref's WsgiToAsgi is not used - it runs every request on one thread.)
+"""
+
+import os
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError as e:
+    raise ImportError("ASGI mode needs a2wsgi: pip install a2wsgi uvicorn") from e
+
+from app import app
+
+ASGI_THREADS = int(os.getenv("ASGI_THREADS", "16"))
+
+application = WSGIMiddleware(app, workers=ASGI_THREADS)
@@ -0,0 +1,315 @@
+"""
+Batch - Deferred LLM calls submitted as batch jobs, for offline bulk runs.
+
+BatchProvider is a Provider whose complete() doesn't call the model: the
+prompt joins a BatchCollector, which submits up to BATCH_MAX_SIZE pending
+prompts as one job (or whatever has gathered after BATCH_MAX_WAIT seconds),
+polls the job every BATCH_POLL_INTERVAL and hands each caller its own text.
+Behind the Router it looks like a very slow provider, so GeminiClient,
+its parser, rule rewrites and follow-ups all work unchanged - they just
+block until their batch comes back. One job per batch instead of one call
+per prompt, at the batch API's lower per-token price.
+
+Backends: Gemini's batch API (inline requests, results in request order)
+and a small HTTP protocol in the same style, served locally by
+bench/batch_server.py.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+import requests
+
+from metrics import inc
+from providers import DEFAULT_TIER, GENAI_AVAILABLE, Provider
+from structured_logging import get_logger
+
+if GENAI_AVAILABLE:
+    from google import genai
+
+log = get_logger("batch")
+
+# Prompts per job; a job also goes out once its oldest prompt waited BATCH_MAX_WAIT seconds
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+BATCH_MAX_WAIT = float(os.getenv("BATCH_MAX_WAIT", "2"))
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "10"))
+# Give up on a job after this long (Gemini's batch target is 24h)
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", str(24 * 3600)))
+
+SUCCEEDED = "JOB_STATE_SUCCEEDED"
+FAILED_STATES = ("JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED")
+
+
+class BatchJobFailed(RuntimeError):
+    """The batch job (or this request within it) finished without a result."""
+
+
+# ============ BACKENDS ============
+
+class BatchBackend:
+    """Submits a list of (prompt, options) requests as one job and polls it."""
+
+    def submit(self, batch):
+        """Create a job for `batch`; returns the job name."""
+        raise NotImplementedError
+
+    def poll(self, name):
+        """
+        (state, results): results is None until the job succeeds, then one
+        entry per submitted request, in order - the text or an Exception.
+        """
+        raise NotImplementedError
+
+
+def _generation_config(options):
+    config = {
+        "temperature": options.get("temperature", 0.5),
+        "max_output_tokens": options.get("max_output_tokens", 4000),
+    }
+    if options.get("seed") is not None:
+        config["seed"] = options["seed"]
+    if options.get("schema"):
+        config["response_mime_type"] = "application/json"
+        config["response_schema"] = options["schema"]
+    return config
+
+
+def _result(text, error=None):
+    """One request's result: its stripped text, or BatchJobFailed when there's no usable text."""
+    if error is None and isinstance(text, str) and text.strip():
+        return text.strip()
+    return BatchJobFailed(str(error or "empty response"))
+
+
+class GeminiBatchBackend(BatchBackend):
+    """Gemini batch mode with inline requests (client.batches)."""
+
+    def __init__(self, model_id, api_key=None):
+        if not GENAI_AVAILABLE:
+            raise ValueError("google-genai is not installed")
+        self.model_id = model_id
+        self.client = genai.Client(api_key=api_key)
+
+    def submit(self, batch):
+        job = self.client.batches.create(
+            model=self.model_id,
+            src=[{"contents": [{"role": "user", "parts": [{"text": prompt}]}],
+                  "config": _generation_config(options)} for prompt, options in batch],
+            config={"display_name": f"copygen-{int(time.time())}-{len(batch)}"},
+        )
+        return job.name
+
+    def poll(self, name):
+        job = self.client.batches.get(name=name)
+        state = job.state.name
+        if state != SUCCEEDED:
+            return state, None
+        results = []
+        for item in job.dest.inlined_responses:
+            # text is None when the candidate was blocked or empty
+            text = getattr(item.response, "text", None) if item.error is None else None
+            results.append(_result(text, item.error))
+        return state, results
+
+
+class HTTPBatchBackend(BatchBackend):
+    """
+    POST {base_url}/batches {"model", "requests": [{"key", "prompt", "config"}]}
+    -> {"name", "state"}; GET {base_url}/<name> -> {"state", "responses":
+    [{"key", "text"} or {"key", "error"}]} once the state is JOB_STATE_SUCCEEDED.
+    """
+
+    def __init__(self, base_url, model_id, api_key=None, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.model_id = model_id
+        self.timeout = timeout
+        self.session = requests.Session()
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def submit(self, batch):
+        response = self.session.post(f"{self.base_url}/batches", timeout=self.timeout, json={
+            "model": self.model_id,
+            "requests": [{"key": str(i), "prompt": prompt, "config": _generation_config(options)}
+                         for i, (prompt, options) in enumerate(batch)],
+        })
+        response.raise_for_status()
+        return response.json()["name"]
+
+    def poll(self, name):
+        response = self.session.get(f"{self.base_url}/{name}", timeout=self.timeout)
+        response.raise_for_status()
+        job = response.json()
+        if job["state"] != SUCCEEDED:
+            return job["state"], None
+        responses = sorted(job.get("responses", []), key=lambda item: int(item["key"]))
+        return job["state"], [_result(item.get("text"), item.get("error")) for item in responses]
+
+
+# ============ COLLECTOR ============
+
+class _Job:
+    __slots__ = ("name", "futures", "submitted", "next_poll")
+
+    def __init__(self, name, futures, submitted):
+        self.name = name
+        self.futures = futures
+        self.submitted = submitted
+        self.next_poll = submitted
+
+
+class BatchCollector:
+    """
+    Gathers prompts from many caller threads into jobs on one backend. A
+    single daemon thread submits jobs and polls the running ones.
+    """
+
+    def __init__(self, backend, max_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT,
+                 poll_interval=BATCH_POLL_INTERVAL, timeout=BATCH_TIMEOUT, clock=time.monotonic):
+        self.backend = backend
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.clock = clock
+        self._pending = []
+        self._first_pending = None
+        self._jobs = []
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, prompt, options):
+        """Queue one request; returns a Future resolving to the model's text."""
+        future = Future()
+        with self._cond:
+            if not self._pending:
+                self._first_pending = self.clock()
+            self._pending.append((prompt, options, future))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="batch-collector", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def _take_ready(self, now):
+        """Pending requests due to go out as a job now (caller holds the lock)."""
+        if not self._pending:
+            return []
+        if len(self._pending) < self.max_size and now - self._first_pending < self.max_wait:
+            return []
+        batch, self._pending = self._pending[:self.max_size], self._pending[self.max_size:]
+        self._first_pending = now if self._pending else None
+        return batch
+
+    def _next_wakeup(self, now):
+        deadlines = [job.next_poll for job in self._jobs]
+        if self._pending:
+            deadlines.append(self._first_pending + self.max_wait)
+        return max(0.0, min(deadlines) - now) if deadlines else None
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                now = self.clock()
+                batch = self._take_ready(now)
+                due = [job for job in self._jobs if job.next_poll <= now]
+                if not batch and not due:
+                    if not self._pending and not self._jobs:
+                        self._thread = None
+                        return
+                    self._cond.wait(self._next_wakeup(now))
+                    continue
+            if batch:
+                self._dispatch(batch)
+            for job in due:
+                self._poll(job)
+
+    def _dispatch(self, batch):
+        futures = [future for _, _, future in batch]
+        try:
+            name = self.backend.submit([(prompt, options) for prompt, options, _ in batch])
+        except Exception as e:
+            inc("copygen_batch_jobs_total", status="submit_error")
+            log.warning("batch submit failed", extra={"fields": {"requests": len(batch), "error": str(e)}})
+            for future in futures:
+                future.set_exception(e)
+            return
+        inc("copygen_batch_jobs_total", status="submitted")
+        log.info("batch submitted", extra={"fields": {"job": name, "requests": len(batch)}})
+        with self._cond:
+            job = _Job(name, futures, self.clock())
+            job.next_poll = job.submitted + self.poll_interval
+            self._jobs.append(job)
+
+    def _poll(self, job):
+        try:
+            state, results = self.backend.poll(job.name)
+        except Exception as e:
+            # Transient (network, 5xx): try again next interval
+            log.warning("batch poll failed", extra={"fields": {"job": job.name, "error": str(e)}})
+            state, results = None, None
+        now = self.clock()
+        if results is not None:
+            error = None if len(results) == len(job.futures) else BatchJobFailed(
+                f"{job.name} returned {len(results)} results for {len(job.futures)} requests")
+            for future, result in zip(job.futures, results):
+                if error is not None or isinstance(result, Exception):
+                    future.set_exception(error or result)
+                else:
+                    future.set_result(result)
+            status = "failed" if error else "succeeded"
+        elif state in FAILED_STATES or now - job.submitted > self.timeout:
+            error = BatchJobFailed(f"{job.name} ended as {state or 'timed out'}")
+            for future in job.futures:
+                future.set_exception(error)
+            status = "failed"
+        else:
+            job.next_poll = now + self.poll_interval
+            return
+        inc("copygen_batch_jobs_total", status=status)
+        log.info("batch finished", extra={"fields": {"job": job.name, "state": state, "requests": len(job.futures),
+                                                     "seconds": round(now - job.submitted, 1)}})
+        with self._cond:
+            self._jobs.remove(job)
+
+
+class BatchProvider(Provider):
+    """A Provider that defers every completion to a batch job and waits for it."""
+
+    kind = "batch"
+
+    def __init__(self, backend, tier=DEFAULT_TIER, name=None, **collector_options):
+        super().__init__(backend.model_id, tier, name)
+        self.collector = BatchCollector(backend, **collector_options)
+
+    def complete(self, prompt, temperature=0.5, max_output_tokens=4000, seed=None, schema=None, timeout=None):
+        # No per-call timeout: a batch job takes what it takes (see BATCH_TIMEOUT)
+        future = self.collector.submit(prompt, {"temperature": temperature, "max_output_tokens": max_output_tokens,
+                                                "seed": seed, "schema": schema})
+        return future.result()
+
+
+# ============ CONFIGURATION ============
+
+def batch_providers_from_env(**collector_options):
+    """
+    Batch providers from the environment:
+      BATCH_BASE_URL   -> HTTPBatchBackend on BATCH_MODEL (flash), e.g. bench.batch_server
+      GEMINI_API_KEY   -> Gemini batch mode on GEMINI_FLASH_MODEL (flash) + GEMINI_PRO_MODEL (pro)
+    """
+    base_url = os.getenv("BATCH_BASE_URL")
+    if base_url:
+        backend = HTTPBatchBackend(base_url, os.getenv("BATCH_MODEL", "batch"), os.getenv("BATCH_API_KEY"))
+        return [BatchProvider(backend, DEFAULT_TIER, **collector_options)]
+
+    providers = []
+    api_key = os.getenv("GEMINI_API_KEY")
+    if api_key and api_key != "your_api_key_here" and GENAI_AVAILABLE:
+        flash = GeminiBatchBackend(os.getenv("GEMINI_FLASH_MODEL", "gemini-2.5-flash"), api_key)
+        providers.append(BatchProvider(flash, "flash", **collector_options))
+        pro_model = os.getenv("GEMINI_PRO_MODEL", "gemini-2.5-pro")
+        if pro_model:
+            providers.append(BatchProvider(GeminiBatchBackend(pro_model, api_key), "pro", **collector_options))
+    return providers
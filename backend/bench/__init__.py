@@ -0,0 +1,7 @@
+"""
+Offline benchmark suite.
+Runs the generation pipeline against local fixture pages and a fake LLM - no network needed.
+
+Usage (from backend/):
+    python -m bench.run
+"""
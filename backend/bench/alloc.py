@@ -0,0 +1,139 @@
+"""
+Allocation Harness - tracemalloc view of template-mode memory per request.
+
+Reports, for the template fallback path (CopyEngine + hooks, then + dedupe):
+  - hook/template table footprint (allocated while importing hooks.py)
+  - bytes and blocks an in-flight engine holds (what concurrency multiplies)
+  - transient peak and surviving blocks per call
+  - gen-0 GC collections per 1000 calls (allocation churn seen by the collector)
+
+    python -m bench.alloc
+    python -m bench.alloc --requests 2000 --json alloc.json
+
+Dict-of-lists hooks + per-engine lists/RNG vs NamedTuple/tuple tables, lazy
+placeholders and a slotted engine (500 calls, 1 vCPU, under tracemalloc):
+
+                          before    after
+    engine_held_bytes       2881      173
+    engine_held_blocks       6.3      2.3
+    template_peak_kb_p50    3.12     2.46
+    template_us_per_request  882      471    (155 -> 82 us untraced)
+
+The fallback numbers are dominated by dedupe signatures and barely move.
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Trace from before any backend module loads so the static tables are counted
+tracemalloc.start(1)
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+os.environ.setdefault("HISTORY_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="copygen-alloc-"), "history.db"))
+# Every request fetches and parses its page, as on a cold context cache
+os.environ.setdefault("CONTEXT_CACHE_ENABLED", "0")
+
+import copy_engine  # noqa: E402
+import hooks  # noqa: E402
+from bench.run import BRIEFS  # noqa: E402
+
+
+def _table_footprint():
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(True, os.path.abspath(hooks.__file__))])
+    stats = snapshot.statistics("filename")
+    return sum(s.size for s in stats), sum(s.count for s in stats)
+
+
+def _engine(i):
+    client, industry, audience, strategy = BRIEFS[i % len(BRIEFS)]
+    return copy_engine.CopyEngine(client, industry, audience, "https://example.com", strategy)
+
+
+def _generate(engine):
+    return engine._replace_near_duplicates(engine.generate_variations_template(4), "template")
+
+
+def measure(requests, held=200):
+    table_bytes, table_blocks = _table_footprint()
+
+    # Warm caches (hook index, dedupe history, code objects) outside the measurement
+    for i in range(50):
+        _generate(_engine(i))
+    gc.collect()
+
+    # Footprint of engines held in flight, after one generation each
+    before = tracemalloc.take_snapshot()
+    live = [_engine(i) for i in range(held)]
+    for engine in live:
+        _generate(engine)
+    after = tracemalloc.take_snapshot()
+    diff = [d for d in after.compare_to(before, "filename")
+            if d.traceback[0].filename.endswith("copy_engine.py")]
+    engine_bytes = sum(d.size_diff for d in diff) / held
+    engine_blocks = sum(d.count_diff for d in diff) / held
+    del live
+    gc.collect()
+
+    result = {
+        "requests": requests,
+        "table_kb": round(table_bytes / 1024, 1),
+        "table_blocks": table_blocks,
+        "engine_held_bytes": round(engine_bytes),
+        "engine_held_blocks": round(engine_blocks, 1),
+    }
+    for label, call in (("template", lambda e: e.generate_variations_template(4)), ("fallback", _generate)):
+        result.update({f"{label}_{k}": v for k, v in _churn(call, requests).items()})
+    return result
+
+
+def _churn(call, requests):
+    """Transient peak, surviving blocks and GC activity per call."""
+    peaks = []
+    gen0_before = gc.get_stats()[0]["collections"]
+    blocks_before = sys.getallocatedblocks()
+    start = time.perf_counter()
+    for i in range(requests):
+        engine = _engine(i)
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        call(engine)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    elapsed = time.perf_counter() - start
+    gen0 = gc.get_stats()[0]["collections"] - gen0_before
+
+    peaks.sort()
+    return {
+        "peak_kb_p50": round(peaks[len(peaks) // 2] / 1024, 2),
+        "peak_kb_max": round(peaks[-1] / 1024, 2),
+        "net_blocks": round((sys.getallocatedblocks() - blocks_before) / requests, 2),
+        "gen0_per_1000": round(gen0 * 1000 / requests, 1),
+        "us_per_request": round(elapsed / requests * 1e6, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Template-mode allocation harness")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--json", help="also write results to this path")
+    args = parser.parse_args(argv)
+
+    result = measure(args.requests)
+    width = max(map(len, result))
+    for key, value in result.items():
+        print(f"{key:<{width}}  {value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Batch Bench - Bulk generation with one model call per prompt vs batch jobs.
+
+Runs the same seeded briefs through generate_copy twice: against the local
+OpenAI-compatible fake (bench/llm_server.py) with --workers threads, then
+through BatchProvider against the local batch API (bench/batch_server.py)
+with every row in flight. "API requests" is what each run spends against
+request-rate quotas (batch: submissions + polls).
+
+    python -m bench.batch
+    python -m bench.batch --rows 200 --batch-size 100 --queue-ms 5000
+
+64 rows, 8 sync workers, batches of 64, 2s queue, 0.5s polling:
+
+    mode      seconds   rows/s   API requests   rows/request
+    sync        11.2      5.7             64          1.0
+    batch        5.2     12.3             11          5.8
+
+Real batch queues take minutes to hours, so only the request count carries
+over; the point is quota and price, not latency.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+os.environ.setdefault("HISTORY_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="copygen-batch-"), "history.db"))
+
+from batch import BatchProvider, HTTPBatchBackend  # noqa: E402
+from bench.batch_server import StubBatchServer  # noqa: E402
+from bench.fake_llm import FakeLLMConfig  # noqa: E402
+from bench.llm_server import StubLLMServer  # noqa: E402
+from bench.run import BRIEFS  # noqa: E402
+from copy_engine import generate_copy  # noqa: E402
+from providers import OpenAICompatibleProvider, Router, set_router  # noqa: E402
+
+
+def run_rows(router, rows, workers):
+    """generate_copy for `rows` seeded briefs; returns (seconds, variations per row)."""
+    set_router(router)
+
+    def one(i):
+        client_name, industry, audience, strategy = BRIEFS[i % len(BRIEFS)]
+        variations = generate_copy(client_name, industry, audience, "", strategy, seed=i)["variations"]
+        # Assigned by the history store, unique per run
+        return [{k: v for k, v in variation.items() if k != "variationId"} for variation in variations]
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(one, range(rows)))
+    finally:
+        set_router(None)
+    return time.perf_counter() - start, results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync vs batch-job bulk generation benchmark")
+    parser.add_argument("--rows", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=8, help="sync run concurrency")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--queue-ms", type=float, default=2000.0, help="batch job wait before it runs")
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    config = FakeLLMConfig(jitter=0.0)
+    print(f"{'mode':<8}{'seconds':>9}{'rows/s':>9}{'API requests':>15}{'rows/request':>15}")
+
+    with StubLLMServer(config) as server:
+        router = Router([OpenAICompatibleProvider(server.base_url, "fake", timeout=30)])
+        seconds, sync_rows = run_rows(router, args.rows, args.workers)
+        _report("sync", seconds, args.rows, server.calls)
+
+    with StubBatchServer(config, queue_ms=args.queue_ms) as server:
+        provider = BatchProvider(HTTPBatchBackend(server.base_url, "fake"), max_size=args.batch_size,
+                                 max_wait=0.5, poll_interval=args.poll_interval)
+        seconds, batch_rows = run_rows(Router([provider]), args.rows, args.rows)
+        _report("batch", seconds, args.rows, server.submissions + server.polls)
+
+    same = sync_rows == batch_rows
+    print(f"\nbatch output identical to sync: {same}")
+    return 0 if same else 1
+
+
+def _report(mode, seconds, rows, api_requests):
+    print(f"{mode:<8}{seconds:>9.1f}{rows / seconds:>9.1f}{api_requests:>15}{rows / max(api_requests, 1):>15.1f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
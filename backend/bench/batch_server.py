@@ -0,0 +1,173 @@
+"""
+Batch Server - Local stand-in for a Gemini-style batch API (see batch.py's
+HTTPBatchBackend). A job takes `--queue-ms` before it starts, then runs its
+requests `--parallelism` at a time at the fake LLM's latency; polling it
+before then reports JOB_STATE_PENDING / JOB_STATE_RUNNING.
+
+    python -m bench.batch_server --port 8011 --queue-ms 2000 &
+    BATCH_BASE_URL=http://127.0.0.1:8011/v1 BATCH_POLL_INTERVAL=1 \\
+        python -m copy_generator bulk briefs.csv --batch
+
+`submissions` and `polls` count the API requests made against it - the
+quota units a sync run would spend one per prompt.
+"""
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.fake_llm import FakeLLMConfig, estimate_tokens, fake_text
+
+
+class _BatchJob:
+    def __init__(self, name, requests, ready_at, rng, error_rate):
+        self.name = name
+        self.ready_at = ready_at
+        self.started_at = None
+        self.responses = []
+        for item in requests:
+            if rng.random() < error_rate:
+                self.responses.append({"key": item["key"], "error": "fake batch: injected error"})
+            else:
+                self.responses.append({"key": item["key"], "text": fake_text(item["prompt"])})
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeBatch/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/batches"):
+            return self._reply(404, {"error": {"message": "not found"}})
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            requests = [{"key": str(r["key"]), "prompt": r["prompt"]} for r in payload["requests"]]
+        except (ValueError, KeyError, TypeError):
+            return self._reply(400, {"error": {"message": "expected requests[] with key and prompt"}})
+        job = self.server.stub.create(requests)
+        self._reply(200, {"name": job.name, "state": "JOB_STATE_PENDING", "requestCount": len(requests)})
+
+    def do_GET(self):
+        _, _, name = self.path.partition("/batches/")
+        job = self.server.stub.jobs.get("batches/" + name.strip("/"))
+        if job is None:
+            return self._reply(404, {"error": {"message": "no such batch"}})
+        state = self.server.stub.state(job)
+        body = {"name": job.name, "state": state}
+        if state == "JOB_STATE_SUCCEEDED":
+            body["responses"] = job.responses
+        self._reply(200, body)
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubBatchServer:
+    """
+    Threaded batch server on a localhost port (ephemeral by default).
+
+        with StubBatchServer(queue_ms=500) as server:
+            HTTPBatchBackend(server.base_url, "fake")
+    """
+
+    def __init__(self, config=None, port=0, queue_ms=2000.0, parallelism=32):
+        self.config = config or FakeLLMConfig()
+        self.port = port
+        self.queue_ms = queue_ms
+        self.parallelism = parallelism
+        self.jobs = {}
+        self.submissions = 0
+        self.polls = 0
+        self.requests = 0
+        self._ids = itertools.count(1)
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _run_seconds(self, job):
+        """Time to work through the job `parallelism` requests at a time."""
+        cfg = self.config
+        seconds = [cfg.ttft_ms / 1000.0 + estimate_tokens(r.get("text", "")) / cfg.tokens_per_sec
+                   for r in job.responses]
+        return sum(seconds) / max(1, min(self.parallelism, len(seconds)))
+
+    def create(self, requests):
+        with self._lock:
+            self.submissions += 1
+            self.requests += len(requests)
+            name = f"batches/{next(self._ids)}"
+            job = _BatchJob(name, requests, time.monotonic() + self.queue_ms / 1000.0,
+                            self._rng, self.config.error_rate)
+            job.ready_at += self._run_seconds(job)
+            self.jobs[name] = job
+            return job
+
+    def state(self, job):
+        with self._lock:
+            self.polls += 1
+        now = time.monotonic()
+        if now >= job.ready_at:
+            return "JOB_STATE_SUCCEEDED"
+        if now >= job.ready_at - self._run_seconds(job):
+            return "JOB_STATE_RUNNING"
+        return "JOB_STATE_PENDING"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Gemini-style batch API stand-in")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--queue-ms", type=float, default=2000.0, help="time a job waits before it runs")
+    parser.add_argument("--parallelism", type=int, default=32, help="requests of one job run at once")
+    parser.add_argument("--ttft-ms", type=float, default=400.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=250.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    config = FakeLLMConfig(args.ttft_ms, 0.0, args.tokens_per_sec, args.error_rate, args.seed)
+    server = StubBatchServer(config, args.port, args.queue_ms, args.parallelism).start()
+    print(f"Fake batch API listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
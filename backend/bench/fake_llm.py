@@ -0,0 +1,124 @@
+"""
+Fake LLM - Stand-in for GeminiClient with configurable latency, token rate and errors.
+Everything except the model call (website analysis, prompt build, parsing) runs for real.
+"""
+
+import json
+import random
+import threading
+import time
+
+import gemini_client
+from gemini_client import GeminiClient
+
+# Angles the real prompt asks for, in order
+FAKE_HOOKS = ["Unexpected Insight", "Specificity Play", "Casual Value Drop", "Pattern Break"]
+
+
+class FakeLLMConfig:
+    """
+    Latency model: a lognormal time-to-first-token around `ttft_ms`, plus
+    output tokens streamed at `tokens_per_sec`. A fraction `error_rate`
+    of calls raise instead of answering.
+    """
+
+    def __init__(self, ttft_ms=400.0, jitter=0.35, tokens_per_sec=250.0, error_rate=0.0, seed=1234):
+        self.ttft_ms = ttft_ms
+        self.jitter = jitter
+        self.tokens_per_sec = tokens_per_sec
+        self.error_rate = error_rate
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(vars(self))
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 chars per token), good enough for latency modelling."""
+    return max(1, len(text) // 4)
+
+
+def _fake_emails(count):
+    for i in range(count):
+        hook = FAKE_HOOKS[i % len(FAKE_HOOKS)]
+        yield i + 1, hook, {
+            "subject": f"quick thought on {hook.lower()}",
+            "body": "Most teams assume the bottleneck is volume. "
+                    "It's usually the handoff.\n\nWe mapped where it leaks.\n\nWorth a quick look?",
+            "ps": "P.S. No pressure either way - just thought it might click.",
+        }
+
+
+def fake_response_text(count=4):
+    """A well-formed verbose-JSON response like the real model returns."""
+    variations = [{"id": i, "hookType": hook, "subject": email["subject"],
+                   "body": "{{first_name}} – " + email["body"], "ps": email["ps"]}
+                  for i, hook, email in _fake_emails(count)]
+    return json.dumps({"variations": variations}, indent=2)
+
+
+def fake_compact_text(count=4):
+    """The same emails in the compact schema-constrained format (no ids, labels or greeting)."""
+    return json.dumps({"v": [{"s": email["subject"], "b": email["body"], "p": email["ps"]}
+                             for _, _, email in _fake_emails(count)]})
+
+
+def fake_follow_up_text(count=4):
+    """A well-formed follow-up step response."""
+    follow_ups = [{"id": i + 1, "body": "{{first_name}} – circling back on the handoff point.\n\n"
+                                        "Happy to send the one-pager.\n\nWant me to send it over?"}
+                  for i in range(count)]
+    return json.dumps({"followUps": follow_ups}, indent=2)
+
+
+def fake_text(prompt):
+    """The canned response matching the kind of prompt (first touch, compact or follow-up step)."""
+    if "## WRITE FOLLOW-UP" in prompt:
+        return fake_follow_up_text()
+    if "## OUTPUT FORMAT (COMPACT JSON)" in prompt:
+        return fake_compact_text()
+    return fake_response_text()
+
+
+class FakeGeminiClient(GeminiClient):
+    """GeminiClient whose model call sleeps according to a FakeLLMConfig."""
+
+    config = FakeLLMConfig()
+    _rng = random.Random(config.seed)
+    _rng_lock = threading.Lock()
+    calls = 0
+    output_tokens = 0
+
+    def __init__(self, output_format=None):
+        # No API key / SDK client needed
+        self.client = None
+        self.model_id = "fake-flash"
+        if output_format:
+            self.output_format = output_format
+
+    def _call_model(self, prompt, schema=None):
+        cfg = self.config
+        text = fake_text(prompt)
+        with self._rng_lock:
+            FakeGeminiClient.calls += 1
+            FakeGeminiClient.output_tokens += estimate_tokens(text)
+            ttft = self._rng.lognormvariate(0, cfg.jitter) * cfg.ttft_ms / 1000.0
+            fail = self._rng.random() < cfg.error_rate
+        time.sleep(ttft)
+        if fail:
+            raise RuntimeError("fake LLM: injected error")
+        time.sleep(estimate_tokens(text) / cfg.tokens_per_sec)
+        return text
+
+
+def install(config=None):
+    """Route get_gemini_client() to the fake and (re)seed its RNG."""
+    FakeGeminiClient.config = config or FakeLLMConfig()
+    FakeGeminiClient._rng = random.Random(FakeGeminiClient.config.seed)
+    FakeGeminiClient.calls = 0
+    FakeGeminiClient.output_tokens = 0
+    gemini_client.set_client_factory(FakeGeminiClient)
+
+
+def uninstall():
+    gemini_client.set_client_factory(None)
@@ -0,0 +1,59 @@
+"""
+Fixture Server - Serves recorded client homepages from bench/fixtures over local HTTP.
+"""
+
+import os
+import threading
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """
+    Threaded HTTP server on an ephemeral localhost port.
+
+        with FixtureServer() as server:
+            analyze_website(server.urls[0])
+    """
+
+    def __init__(self, directory=FIXTURES_DIR):
+        self.directory = directory
+        self.pages = sorted(f for f in os.listdir(directory) if f.endswith(".html"))
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def urls(self):
+        return [f"{self.base_url}/{page}" for page in self.pages]
+
+    def start(self):
+        handler = partial(_QuietHandler, directory=self.directory)
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
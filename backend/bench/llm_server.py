@@ -0,0 +1,129 @@
+"""
+LLM Server - Local OpenAI-compatible stand-in (POST /v1/chat/completions).
+Answers with the fake LLM's canned JSON after the FakeLLMConfig latency, so the
+OpenAI-compatible provider and the router can be exercised without a real model.
+
+    python -m bench.llm_server --port 8010 --ttft-ms 300 --error-rate 0.1
+    OPENAI_COMPAT_BASE_URL=http://127.0.0.1:8010/v1 python app.py
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.fake_llm import FakeLLMConfig, estimate_tokens, fake_text
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeLLM/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._reply(404, {"error": {"message": "not found"}})
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            prompt = payload["messages"][-1]["content"]
+        except (ValueError, KeyError, IndexError):
+            return self._reply(400, {"error": {"message": "expected messages[]"}})
+
+        stub = self.server.stub
+        text = fake_text(prompt)
+        ttft, fail = stub.sample()
+        time.sleep(ttft)
+        if fail:
+            return self._reply(500, {"error": {"message": "fake LLM: injected error"}})
+        time.sleep(estimate_tokens(text) / stub.config.tokens_per_sec)
+        self._reply(200, {
+            "id": f"chatcmpl-{stub.calls}",
+            "object": "chat.completion",
+            "model": payload.get("model", "fake"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": estimate_tokens(text)},
+        })
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class StubLLMServer:
+    """
+    Threaded OpenAI-compatible server on a localhost port (ephemeral by default).
+
+        with StubLLMServer(FakeLLMConfig(ttft_ms=200)) as server:
+            OpenAICompatibleProvider(server.base_url, "fake")
+    """
+
+    def __init__(self, config=None, port=0):
+        self.config = config or FakeLLMConfig()
+        self.port = port
+        self.calls = 0
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def sample(self):
+        """(time to first token, whether this call fails) for the next request."""
+        with self._lock:
+            self.calls += 1
+            ttft = self._rng.lognormvariate(0, self.config.jitter) * self.config.ttft_ms / 1000.0
+            return ttft, self._rng.random() < self.config.error_rate
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible fake LLM")
+    parser.add_argument("--port", type=int, default=8010)
+    parser.add_argument("--ttft-ms", type=float, default=400.0)
+    parser.add_argument("--jitter", type=float, default=0.35)
+    parser.add_argument("--tokens-per-sec", type=float, default=250.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args(argv)
+
+    config = FakeLLMConfig(args.ttft_ms, args.jitter, args.tokens_per_sec, args.error_rate, args.seed)
+    server = StubLLMServer(config, args.port).start()
+    print(f"Fake LLM listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Output Format Bench - Output tokens and latency of verbose vs compact LLM output.
+
+Runs GeminiClient.generate_variations against the fake model, which takes
+time-to-first-token plus a fixed time per output token, once per output
+format. The compact format (one-letter keys, no ids, hook labels or greeting,
+schema-constrained) is expanded back to the usual variations, and the bench
+checks both formats yield identical copy.
+
+    python -m bench.output_format
+    python -m bench.output_format --requests 50 --tokens-per-sec 120
+
+Tokens are estimated at ~4 chars each. 30 requests, ttft 400ms, 250 tok/s:
+
+    format     out tokens   llm p50    llm p95   parse ms
+    json              360   1851.3ms   2121.8ms     0.08
+    compact           242   1379.3ms   1649.1ms     0.08
+
+The canned bodies are short; real 40-50 word bodies shift the ratio a little
+toward the text itself, but the per-variation overhead saved is the same.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+from bench.fake_llm import FakeGeminiClient, FakeLLMConfig, install, uninstall  # noqa: E402
+from bench.run import BRIEFS, percentile  # noqa: E402
+
+FORMATS = ("json", "compact")
+
+
+def run_format(output_format, requests):
+    """Generate `requests` times; return (variations of the last call, per-call stats)."""
+    FakeGeminiClient.output_tokens = 0
+    FakeGeminiClient.calls = 0
+    latencies = []
+    parse_seconds = 0.0
+    variations = None
+    for i in range(requests):
+        client_name, industry, audience, strategy = BRIEFS[i % len(BRIEFS)]
+        client = FakeGeminiClient(output_format)
+        original_parse = client.parse_response
+
+        def timed_parse(text):
+            nonlocal parse_seconds
+            start = time.perf_counter()
+            try:
+                return original_parse(text)
+            finally:
+                parse_seconds += time.perf_counter() - start
+
+        client.parse_response = timed_parse
+        start = time.perf_counter()
+        result = client.generate_variations(client_name, industry, audience, "", strategy)
+        latencies.append(time.perf_counter() - start)
+        variations = result["variations"]
+    latencies.sort()
+    return variations, {
+        "out_tokens": FakeGeminiClient.output_tokens // max(FakeGeminiClient.calls, 1),
+        "llm_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "llm_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "parse_ms": round(parse_seconds / requests * 1000, 2),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Verbose vs compact LLM output benchmark")
+    parser.add_argument("--requests", type=int, default=30)
+    parser.add_argument("--ttft-ms", type=float, default=400.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=250.0)
+    args = parser.parse_args(argv)
+
+    outputs = {}
+    print(f"{'format':<10}{'out tokens':>11}{'llm p50':>11}{'llm p95':>11}{'parse ms':>10}")
+    for output_format in FORMATS:
+        # Same RNG seed per format so both see the same latency draws
+        install(FakeLLMConfig(ttft_ms=args.ttft_ms, tokens_per_sec=args.tokens_per_sec))
+        try:
+            outputs[output_format], stats = run_format(output_format, args.requests)
+        finally:
+            uninstall()
+        print(f"{output_format:<10}{stats['out_tokens']:>11}{stats['llm_p50_ms']:>9.1f}ms"
+              f"{stats['llm_p95_ms']:>9.1f}ms{stats['parse_ms']:>10.2f}")
+
+    same = outputs["json"] == outputs["compact"]
+    print(f"\nexpanded compact output identical to json: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Parse Isolation Bench - Does website parsing load slow down I/O-bound requests?
+
+Probe threads stand in for requests waiting on the LLM: sleep, wake, do a
+little Python work, repeat. Meanwhile loader threads run analyze_website on
+the fixture pages either inline (parsing holds the GIL on the probe's
+interpreter) or through the parse pool. Reports probe latency per mode.
+
+    python -m bench.parse_isolation
+    python -m bench.parse_isolation --seconds 10 --loaders 8 --probes 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("CONTEXT_CACHE_ENABLED", "0")
+
+from bench.fake_llm import fake_response_text  # noqa: E402
+from bench.fixture_server import FixtureServer  # noqa: E402
+from bench.run import percentile  # noqa: E402
+from parse_pool import get_parse_pool, parse_inline, shutdown_parse_pool  # noqa: E402
+from website_analyzer import analyze_website  # noqa: E402
+
+PROBE_SLEEP = 0.02
+LLM_TEXT = fake_response_text()
+
+
+def _probe(stop, latencies, lock):
+    """One 'waiting on I/O' request loop: sleep, then parse a small LLM response."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        time.sleep(PROBE_SLEEP)
+        json.loads(LLM_TEXT)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+
+def _loader(stop, urls, inline, counter, lock):
+    i = 0
+    while not stop.is_set():
+        if inline:
+            with parse_inline():
+                analyze_website(urls[i % len(urls)])
+        else:
+            analyze_website(urls[i % len(urls)])
+        i += 1
+        with lock:
+            counter[0] += 1
+
+
+def run_mode(mode, urls, seconds, loaders, probes):
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies = []
+    parsed = [0]
+    threads = [threading.Thread(target=_probe, args=(stop, latencies, lock)) for _ in range(probes)]
+    if mode != "idle":
+        threads += [threading.Thread(target=_loader, args=(stop, urls, mode == "inline", parsed, lock))
+                    for _ in range(loaders)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    return {
+        "probe_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "probe_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "probe_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "pages_per_sec": round(parsed[0] / seconds, 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse-pool isolation benchmark")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each mode")
+    parser.add_argument("--loaders", type=int, default=4, help="threads running analyze_website")
+    parser.add_argument("--probes", type=int, default=4, help="I/O-bound probe threads")
+    args = parser.parse_args(argv)
+
+    pool = get_parse_pool()
+    if pool is None:
+        print("PARSE_WORKERS=0 - nothing to compare.")
+        return 1
+    pool.warm()
+
+    print(f"probe = sleep {PROBE_SLEEP * 1000:.0f}ms + small JSON parse; "
+          f"{args.loaders} loaders, {args.probes} probes, {pool.workers} parse workers")
+    print(f"{'mode':<8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'pages/s':>9}")
+    try:
+        with FixtureServer() as fixtures:
+            for mode in ("idle", "inline", "pool"):
+                r = run_mode(mode, fixtures.urls, args.seconds, args.loaders, args.probes)
+                print(f"{mode:<8}{r['probe_p50_ms']:>9}{r['probe_p95_ms']:>9}{r['probe_p99_ms']:>9}"
+                      f"{r['pages_per_sec']:>9}")
+    finally:
+        shutdown_parse_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
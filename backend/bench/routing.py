@@ -0,0 +1,84 @@
+"""
+Routing Bench - Drives the provider router against local stand-in LLM servers.
+
+Three OpenAI-compatible fakes with different latency / error profiles sit in
+the flash tier; halfway through, the fastest one goes down. Reports which
+backend served each phase and the router's view of every provider.
+
+    python -m bench.routing
+    python -m bench.routing --requests 200 --concurrency 8
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.fake_llm import FakeLLMConfig
+from bench.llm_server import StubLLMServer
+from providers import OpenAICompatibleProvider, Router
+
+PROFILES = {
+    "fast": FakeLLMConfig(ttft_ms=60, jitter=0.2, tokens_per_sec=20000, seed=1),
+    "flaky": FakeLLMConfig(ttft_ms=40, jitter=0.2, tokens_per_sec=20000, error_rate=0.4, seed=2),
+    "slow": FakeLLMConfig(ttft_ms=250, jitter=0.2, tokens_per_sec=20000, seed=3),
+}
+PROMPT = "## CREATE 4 DISTINCT VARIATIONS\nrouting bench"
+
+
+def run_phase(router, total, concurrency):
+    """Send `total` completions; return (served-by counts, failures, mean latency ms)."""
+    served = Counter()
+    failures = 0
+    latencies = []
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            _, provider = router.complete(PROMPT, max_output_tokens=1000)
+        except Exception:
+            return None, None
+        return provider.name, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for name, elapsed in pool.map(one, range(total)):
+            if name is None:
+                failures += 1
+            else:
+                served[name] += 1
+                latencies.append(elapsed)
+    mean_ms = round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0
+    return served, failures, mean_ms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Provider routing benchmark")
+    parser.add_argument("--requests", type=int, default=120, help="completions per phase")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    servers = {name: StubLLMServer(config).start() for name, config in PROFILES.items()}
+    router = Router([OpenAICompatibleProvider(server.base_url, "fake", name=name, timeout=5)
+                     for name, server in servers.items()])
+    try:
+        phases = [("all up", None), ("fast down", "fast")]
+        for label, outage in phases:
+            if outage:
+                servers[outage].stop()
+            served, failures, mean_ms = run_phase(router, args.requests, args.concurrency)
+            share = "  ".join(f"{name}={served[name]}" for name in PROFILES)
+            print(f"{label:<10} served: {share}  failed={failures}  mean={mean_ms}ms")
+
+        print(f"\n{'provider':<8}{'latency ms':>12}{'error rate':>12}{'calls':>7}{'healthy':>9}")
+        for stats in router.snapshot():
+            print(f"{stats['name']:<8}{str(stats['latencyMs']):>12}{stats['errorRate']:>12}"
+                  f"{stats['calls']:>7}{str(stats['healthy']):>9}")
+    finally:
+        for server in servers.values():
+            server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Benchmark Runner - Drives generate_copy and /api/generate at fixed concurrency levels.
+
+Reports throughput, p50/p95/p99 latency, memory high-water mark and a per-stage
+breakdown, then compares against bench/baseline.json.
+
+    python -m bench.run                      # run + compare against baseline
+    python -m bench.run --update-baseline    # record a new baseline
+    python -m bench.run --targets engine --concurrency 1,8 --requests 40
+    python -m bench.run --targets http --url http://127.0.0.1:8001   # external server
+    python -m bench.run --sequence           # initial email + follow-ups 1-3 per variation
+    python -m bench.run --seeded             # request i carries seed=i (reproducible output)
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Keep the benchmark quiet, single-process and away from the real history DB
+# before any backend module loads
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+os.environ.setdefault("HISTORY_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="copygen-bench-"), "history.db"))
+# Every request fetches and parses its page, as on a cold context cache
+os.environ.setdefault("CONTEXT_CACHE_ENABLED", "0")
+
+import requests  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+import metrics  # noqa: E402
+from bench.fake_llm import FakeLLMConfig, install  # noqa: E402
+from bench.fixture_server import FixtureServer  # noqa: E402
+from copy_engine import generate_copy  # noqa: E402
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+
+BRIEFS = [
+    ("Northwind Growth", "E-commerce", "DTC founders", "Payback windows are stretching and creative fatigue is a pain."),
+    ("Ledgerly", "SaaS", "Controllers at Series B startups", "Month-end close is slow and the spreadsheet process is broken."),
+    ("BrightSmile", "Healthcare", "Busy parents", "No-shows cost the practice and reminders feel robotic."),
+    ("Harbor Supply", "E-commerce", "Outdoor retailers", "Wholesale reorders are slow; the challenge is inventory timing."),
+]
+
+
+# ============ STATS ============
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def rss_high_water_mb():
+    """Peak resident set size of this process (ru_maxrss is KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def stage_breakdown():
+    """Mean milliseconds and call count per instrumented stage since the last reset."""
+    _, histograms = metrics.merge_snapshots([metrics.registry.snapshot()])
+    stages = {}
+    for (name, labels), hist in histograms.items():
+        if name != "copygen_stage_seconds" or not hist["count"]:
+            continue
+        stage = dict(labels).get("stage")
+        stages[stage] = {"mean_ms": round(hist["sum"] / hist["count"] * 1000, 2), "count": hist["count"]}
+    return dict(sorted(stages.items()))
+
+
+# ============ DRIVERS ============
+
+def _brief(i, urls, sequence=False, seeded=False):
+    client, industry, audience, strategy = BRIEFS[i % len(BRIEFS)]
+    return {"clientName": client, "industry": industry, "audience": audience,
+            "website": urls[i % len(urls)], "strategy": strategy, "sequence": sequence,
+            "seed": i if seeded else None}
+
+
+def _engine_call(brief):
+    result = generate_copy(brief["clientName"], brief["industry"], brief["audience"],
+                           brief["website"], brief["strategy"], sequence=brief["sequence"], seed=brief["seed"])
+    if not result.get("variations"):
+        raise RuntimeError("no variations returned")
+
+
+class _HttpDriver:
+    """
+    Posts briefs to /api/generate. Serves the Flask app on a local threaded
+    WSGI server unless `base_url` points at an already-running server.
+    """
+
+    def __init__(self, base_url=None):
+        self.server = None
+        if not base_url:
+            from app import app
+            logging.getLogger("werkzeug").setLevel(logging.ERROR)
+            self.server = make_server("127.0.0.1", 0, app, threaded=True)
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.url = f"{base_url.rstrip('/')}/api/generate"
+        self._local = threading.local()
+
+    def __call__(self, brief):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.post(self.url, json=brief, timeout=120)
+        response.raise_for_status()
+
+    def close(self):
+        if self.server:
+            self.server.shutdown()
+
+
+def run_scenario(call, urls, concurrency, total, **brief_options):
+    """
+    Fire `total` requests through `call` with `concurrency` in flight.
+    Stage breakdown and RSS only cover in-process targets.
+    """
+    call(_brief(0, urls, **brief_options))  # warm-up (imports, connection setup)
+    metrics.registry.reset()
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            call(_brief(i, urls, **brief_options))
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "rss_high_water_mb": rss_high_water_mb(),
+        "stages": stage_breakdown(),
+    }
+
+
+# ============ BASELINE ============
+
+def compare(results, baseline, tolerance):
+    """Return human-readable regressions of p95 latency or throughput beyond `tolerance`."""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if base["p95_ms"] and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {current['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+        if base["throughput_rps"] and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {current['throughput_rps']} rps "
+                               f"vs baseline {base['throughput_rps']} rps")
+    return regressions
+
+
+def print_report(results):
+    print(f"{'scenario':<18}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>5}{'rss MB':>9}")
+    for key, r in results.items():
+        print(f"{key:<18}{r['throughput_rps']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}"
+              f"{r['errors']:>5}{r['rss_high_water_mb']:>9}")
+        stages = "  ".join(f"{stage}={s['mean_ms']}ms" for stage, s in r["stages"].items())
+        print(f"{'':<18}{stages}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline copy-generation benchmark")
+    parser.add_argument("--targets", default="engine,http", help="engine and/or http")
+    parser.add_argument("--concurrency", default="1,4,16")
+    parser.add_argument("--requests", type=int, default=24, help="requests per scenario")
+    parser.add_argument("--ttft-ms", type=float, default=400.0)
+    parser.add_argument("--jitter", type=float, default=0.35)
+    parser.add_argument("--tokens-per-sec", type=float, default=250.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--url", help="drive an already-running server instead of an in-process one")
+    parser.add_argument("--json", help="also write results to this path")
+    parser.add_argument("--sequence", action="store_true", help="generate follow-ups 1-3 as well")
+    parser.add_argument("--seeded", action="store_true", help="send seed=i with request i")
+    args = parser.parse_args(argv)
+
+    config = FakeLLMConfig(args.ttft_ms, args.jitter, args.tokens_per_sec, args.error_rate, args.seed)
+    install(config)
+
+    results = {}
+    with FixtureServer() as fixtures:
+        for target in args.targets.split(","):
+            driver = _HttpDriver(args.url) if target == "http" else None
+            call = driver or _engine_call
+            try:
+                for concurrency in map(int, args.concurrency.split(",")):
+                    label = "remote" if target == "http" and args.url else target
+                    if args.sequence:
+                        label += "+seq"
+                    if args.seeded:
+                        label += "+seed"
+                    results[f"{label}@c{concurrency}"] = run_scenario(
+                        call, fixtures.urls, concurrency, args.requests,
+                        sequence=args.sequence, seeded=args.seeded)
+            finally:
+                if driver:
+                    driver.close()
+
+    print_report(results)
+    report = {"config": config.to_dict(), "results": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found - run with --update-baseline to record one.")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != config.to_dict():
+        print("Baseline was recorded with a different fake-LLM config; skipping comparison.")
+        return 0
+
+    regressions = compare(results, baseline["results"], args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%} of baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Bench Server - Runs the real gunicorn config with the fake LLM installed.
+Used to load-test worker/thread settings; pair with `python -m bench.run --url`.
+
+    python -m bench.serve --workers 2 --threads 16 --port 8001 &
+    python -m bench.run --targets http --url http://127.0.0.1:8001 --concurrency 16,32
+"""
+
+import argparse
+import os
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("CONTEXT_CACHE_ENABLED", "0")
+
+from gunicorn.app.base import Application  # noqa: E402
+
+from bench.fake_llm import FakeLLMConfig, install  # noqa: E402
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gunicorn.conf.py")
+
+
+class BenchApplication(Application):
+    """gunicorn.conf.py plus command-line overrides, serving app:app with the fake LLM."""
+
+    def __init__(self, overrides, llm_config):
+        self.overrides = overrides
+        self.llm_config = llm_config
+        super().__init__()
+
+    def init(self, parser, opts, args):
+        return None
+
+    def load_config(self):
+        self.load_config_from_file(CONFIG_PATH)
+        for key, value in self.overrides.items():
+            if value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        # Runs once in the master (preload_app), so every worker inherits the fake
+        install(self.llm_config)
+        from app import app
+        return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the backend under gunicorn with a fake LLM")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--worker-class")
+    parser.add_argument("--ttft-ms", type=float, default=400.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=250.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    overrides = {
+        "bind": f"127.0.0.1:{args.port}",
+        "workers": args.workers,
+        "threads": args.threads,
+        "worker_class": args.worker_class,
+        "accesslog": None,
+    }
+    llm_config = FakeLLMConfig(ttft_ms=args.ttft_ms, tokens_per_sec=args.tokens_per_sec,
+                               error_rate=args.error_rate)
+    BenchApplication(overrides, llm_config).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Context Cache - Extracted website contexts shared by every worker, keyed on URL.
+analyze_website serves a fresh entry without fetching; a refetch whose page
+bytes hash the same as the stored entry skips extraction and just renews it.
+The table holds at most CONTEXT_CACHE_MAX_ENTRIES rows; past that the least
+recently used are deleted on the next write. refresh.py keeps the configured client URLs warm in the background.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from history_store import HISTORY_DB_PATH
+from metrics import inc
+
+CONTEXT_CACHE_ENABLED = os.getenv("CONTEXT_CACHE_ENABLED", "1") != "0"
+# Entries older than this are refetched on the next request
+CONTEXT_CACHE_TTL = float(os.getenv("CONTEXT_CACHE_TTL", str(6 * 3600)))
+# Least recently used entries beyond this are deleted
+CONTEXT_CACHE_MAX_ENTRIES = int(os.getenv("CONTEXT_CACHE_MAX_ENTRIES", "5000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS website_contexts (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    context TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    used_at REAL NOT NULL DEFAULT 0
+);
+"""
+# Created after the used_at migration below
+INDEXES = "CREATE INDEX IF NOT EXISTS idx_website_contexts_used ON website_contexts (used_at);"
+
+
+def normalize_url(url):
+    return url.strip().rstrip("/")
+
+
+class ContextCache:
+    """SQLite table of url -> (content hash, context, last successful fetch, last use)."""
+
+    def __init__(self, path=HISTORY_DB_PATH, ttl=CONTEXT_CACHE_TTL, max_entries=CONTEXT_CACHE_MAX_ENTRIES,
+                 clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(website_contexts)")}
+            if "used_at" not in columns:
+                conn.execute("ALTER TABLE website_contexts ADD COLUMN used_at REAL NOT NULL DEFAULT 0")
+                conn.execute("UPDATE website_contexts SET used_at = fetched_at")
+            conn.executescript(INDEXES)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def entry(self, url):
+        """The stored row for `url` whatever its age (None if never fetched)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT content_hash, context, fetched_at FROM website_contexts WHERE url = ?",
+                               (normalize_url(url),)).fetchone()
+        if row is None:
+            return None
+        return {"content_hash": row["content_hash"], "context": json.loads(row["context"]),
+                "fetched_at": row["fetched_at"]}
+
+    def get(self, url):
+        """The cached context for `url` if fetched within the TTL, else None."""
+        entry = self.entry(url)
+        if entry is None or self.clock() - entry["fetched_at"] > self.ttl:
+            return None
+        with self._connect() as conn:
+            conn.execute("UPDATE website_contexts SET used_at = ? WHERE url = ?", (self.clock(), normalize_url(url)))
+        return entry["context"]
+
+    def put(self, url, content_hash, context):
+        now = self.clock()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO website_contexts (url, content_hash, context, fetched_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET content_hash = excluded.content_hash, "
+                "context = excluded.context, fetched_at = excluded.fetched_at, used_at = excluded.used_at",
+                (normalize_url(url), content_hash, json.dumps(context), now, now))
+            evicted = conn.execute(
+                "DELETE FROM website_contexts WHERE url IN "
+                "(SELECT url FROM website_contexts ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)).rowcount
+        if evicted > 0:
+            inc("copygen_cache_evictions_total", evicted, cache="website_context")
+
+    def touch(self, url):
+        """Mark `url` as freshly fetched (content unchanged)."""
+        now = self.clock()
+        with self._connect() as conn:
+            conn.execute("UPDATE website_contexts SET fetched_at = ?, used_at = ? WHERE url = ?",
+                         (now, now, normalize_url(url)))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_context_cache():
+    """Process-wide cache (None when CONTEXT_CACHE_ENABLED=0)."""
+    global _cache
+    if not CONTEXT_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ContextCache()
+    return _cache
@@ -5,16 +5,63 @@ Now powered by Gemini Pro API with fallback to template mode.
 """
 
 import random
-from hooks import HOOK_TYPES, CTA_OPTIONS, PS_TEMPLATES, get_all_hook_types, get_hook
+import sqlite3
+import dedupe
+from deadline import MIN_LLM_SECONDS, DeadlineExceeded, degrade
+from dedupe import DUPLICATE_THRESHOLD, max_similarity, signature
+from history_store import get_store
+from hook_stats import get_index
+from hooks import (ANOTHER_COMPANIES, ASSUMED_CAUSES, BIG_COMPANIES, CLAIM_FREE_HOOK_KEYS, CTA_OPTIONS,
+                   DEFAULT_FRAME_FLIP, FOLLOW_UP_STEPS, HOOK_KEYS_BY_NAME, HOOK_NAMES, PS_TEMPLATES, get_all_hook_types,
+                   get_follow_up, get_hook)
+from metrics import inc, timer
+from structured_logging import bind_request_id, get_logger, get_request_id
+from validator import check, repair, validate_variation
+
+log = get_logger("copy_engine")
 
 # Try to import Gemini client - may fail if not configured
 try:
     from gemini_client import get_gemini_client
     GEMINI_AVAILABLE = True
 except Exception as e:
-    print(f"Gemini client not available: {e}")
+    log.warning("gemini client not available", extra={"fields": {"error": str(e)}})
     GEMINI_AVAILABLE = False
 
+PAIN_KEYWORDS = ("pain", "problem", "issue", "challenge", "struggle", "slow", "broken", "cost")
+
+# Template placeholders, each computed only when a template actually uses it
+_TEMPLATE_VALUES = {
+    "client": lambda e: e.client_name,
+    "industry": lambda e: e.industry,
+    "audience": lambda e: e.audience,
+    "website": lambda e: e.website,
+    "problem": lambda e: e.rng.choice(e.pain_points) if e.pain_points else "growth bottlenecks",
+    "process": lambda e: "outreach" if "outreach" in e.strategy.lower() else "workflow",
+    "specific_issue": lambda e: "email timing" if "email" in e.strategy.lower() else "conversion flow",
+    "observation": lambda e: f"how {e.client_name} is approaching {e.industry}",
+    "big_company": lambda e: e.rng.choice(BIG_COMPANIES),
+    "another_company": lambda e: e.rng.choice(ANOTHER_COMPANIES),
+    "assumed_cause": lambda e: e.rng.choice(ASSUMED_CAUSES),
+}
+
+
+class _TemplateVars(dict):
+    """format_map() namespace: values resolved lazily, unknown placeholders left as-is."""
+
+    __slots__ = ("engine",)
+
+    def __init__(self, engine, extra_vars):
+        super().__init__(extra_vars)
+        self.engine = engine
+
+    def __missing__(self, key):
+        compute = _TEMPLATE_VALUES.get(key)
+        if compute is None:
+            return "{" + key + "}"
+        value = self[key] = compute(self.engine)
+        return value
+
 
 class CopyEngine:
     """
@@ -26,85 +73,83 @@ class CopyEngine:
     Uses Gemini Pro API when available, falls back to templates.
     """
 
-    def __init__(self, client_name, industry, audience, website, strategy):
+    __slots__ = ("client_name", "industry", "audience", "website", "strategy", "tier", "seed", "rng", "use_llm", "session_id",
+                 "deadline", "template_fallback", "pain_points", "context", "model", "prompt_version", "fallback",
+                 "_llm")
+
+    def __init__(self, client_name, industry, audience, website, strategy, tier="flash", seed=None,
+                 use_llm=True, session_id=None, deadline=None, template_fallback=True):
         self.client_name = client_name
         self.industry = industry
         self.audience = audience
         self.website = website
         self.strategy = strategy
+        self.tier = tier
+        # Per-request RNG: a seeded engine makes the same choices for the same brief
+        # (unseeded engines share the module-level generator)
+        self.seed = seed
+        self.rng = random.Random(seed) if seed is not None else random
+        # False under overload: serve templates without touching the LLM
+        self.use_llm = use_llm
+        # Wizard session whose /api/prefetch scrape this request can reuse
+        self.session_id = session_id
+        # Request budget (deadline.py); None for offline jobs
+        self.deadline = deadline
+        # False raises the LLM's error instead of serving template copy (batch jobs)
+        self.template_fallback = template_fallback
         
         # Extract key signals from strategy for personalization (fallback mode)
         self.pain_points = self._extract_pain_points(strategy)
-        self.big_companies = ["Cozy Earth", "YSL", "BMW", "Microsoft", "Shopify"]
+        
+        # Provenance of the last generation (recorded in the history store)
+        self.context = None
+        self.model = "template"
+        self.prompt_version = "template"
+        # {"reason", "error"} when the last generation fell back to templates
+        self.fallback = None
+        # LLM client that produced the last variations (reused for follow-ups)
+        self._llm = None
+
+    def _has_llm_time(self, step):
+        """False (counting the degradation `step`) when the deadline leaves too little for an LLM round."""
+        if self.deadline is None or self.deadline.budget() >= MIN_LLM_SECONDS:
+            return True
+        degrade(step)
+        return False
 
     def _extract_pain_points(self, strategy):
         """
         In a full implementation, this would use NLP/LLM to extract pain points.
         For now, we use simple keyword matching and fallbacks.
         """
-        keywords = ["pain", "problem", "issue", "challenge", "struggle", "slow", "broken", "cost"]
-        sentences = strategy.split('.')
-        
-        pain_points = []
-        for sentence in sentences:
-            lower = sentence.lower()
-            if any(kw in lower for kw in keywords):
-                pain_points.append(sentence.strip())
+        pain_points = tuple(
+            sentence.strip() for sentence in strategy.split('.')
+            if any(kw in sentence.lower() for kw in PAIN_KEYWORDS)
+        )
         
         # Fallbacks based on industry
         if not pain_points:
-            pain_points = [
+            pain_points = (
                 f"scaling {self.industry} operations efficiently",
                 f"reaching {self.audience} at the right moment",
-                f"converting leads without burning budget"
-            ]
+                "converting leads without burning budget",
+            )
         
         return pain_points
 
     def _fill_template(self, template, **extra_vars):
         """Fill a template string with context variables."""
-        context = {
-            "client": self.client_name,
-            "industry": self.industry,
-            "audience": self.audience,
-            "website": self.website,
-            "problem": random.choice(self.pain_points) if self.pain_points else "growth bottlenecks",
-            "process": "outreach" if "outreach" in self.strategy.lower() else "workflow",
-            "specific_issue": "email timing" if "email" in self.strategy.lower() else "conversion flow",
-            "observation": f"how {self.client_name} is approaching {self.industry}",
-            "big_company": random.choice(self.big_companies),
-            "another_company": random.choice([c for c in self.big_companies if c != self.big_companies[0]])
-        }
-        context.update(extra_vars)
-        
-        try:
-            return template.format(**context)
-        except KeyError:
-            # If a placeholder isn't found, just return the template with partial fills
-            result = template
-            for key, val in context.items():
-                result = result.replace("{" + key + "}", str(val))
-            return result
+        return template.format_map(_TemplateVars(self, extra_vars))
 
-    def _generate_body(self, hook_type, opener):
+    def _generate_body(self, hook, opener):
         """
         Generate the email body following the structure:
         1. Pattern interrupt (opener)
         2. Flip the frame / insight
         3. Small CTA
         """
-        # Frame flip based on hook type
-        frame_flips = {
-            "shot_in_the_dark": f"The conventional approach in {self.industry} usually misses the nuance. What we've seen work is a lighter-touch model.",
-            "clarity_gap": f"Most people assume it's a {random.choice(['content', 'targeting', 'timing'])} issue. But the real blocker is usually upstream.",
-            "math_problem": f"On paper, the metrics look fine. But when you zoom into payback windows, the story changes.",
-            "overlooked_detail": f"It's a small thing — but when we fixed this for similar {self.industry} companies, replies went up 3x.",
-            "anti_pitch": f"Just flagging something I've observed. No agenda here — just thought it might save you some headaches.",
-            "status_signaling": f"This is something we stumbled on working with teams at {random.choice(self.big_companies)}. Might be worth exploring for {self.client_name}."
-        }
-        
-        frame_flip = frame_flips.get(hook_type, "There's a simpler fix than what most people try first.")
-        cta = random.choice(CTA_OPTIONS)
+        frame_flip = self._fill_template(hook.frame_flip or DEFAULT_FRAME_FLIP)
+        cta = self.rng.choice(CTA_OPTIONS)
         
         body = f"""{opener}
 
@@ -118,34 +163,67 @@ class CopyEngine:
         hook = get_hook(hook_key)
         
         # Select and fill subject
-        subject_template = random.choice(hook["subject_templates"])
+        subject_template = self.rng.choice(hook.subject_templates)
         subject = self._fill_template(subject_template)
         
         # Select and fill opener
-        opener_template = random.choice(hook["opener_templates"])
+        opener_template = self.rng.choice(hook.opener_templates)
         opener = self._fill_template(opener_template)
         
         # Generate body
-        body = self._generate_body(hook_key, opener)
+        body = self._generate_body(hook, opener)
         
         # Select and fill P.S.
-        ps_template = random.choice(PS_TEMPLATES)
+        ps_template = self.rng.choice(PS_TEMPLATES)
         ps = self._fill_template(ps_template)
         
         return {
             "id": variation_id,
-            "hookType": hook["name"],
+            "hookType": hook.name,
             "subject": subject,
             "body": body,
             "ps": ps
         }
 
+    def _select_hooks(self, count):
+        """
+        Pick hook types for this segment by Thompson sampling over past reply
+        rates; uniform random when there's no outcome data (or no index).
+        Seeded requests skip the index - its counts change as outcomes arrive,
+        and a replay must pick the same hooks.
+        """
+        count = min(count, len(HOOK_NAMES))
+        if self.seed is not None:
+            return self.rng.sample(get_all_hook_types(), count)
+        try:
+            names = get_index().select(self.industry, self.audience, HOOK_NAMES, count, rng=self.rng)
+        except sqlite3.Error as e:
+            log.warning("hook index unavailable, sampling uniformly", extra={"fields": {"error": str(e)}})
+            return self.rng.sample(get_all_hook_types(), count)
+        return [HOOK_KEYS_BY_NAME[name] for name in names]
+
+    def _rank_hooks(self, hook_keys):
+        """
+        Order `hook_keys` best-first by a Thompson draw from the hook index,
+        so swapped-in hooks follow the same bandit as the original picks.
+        Shuffled when seeded or when the index is unavailable.
+        """
+        hook_keys = list(hook_keys)
+        if self.seed is None and hook_keys:
+            try:
+                names = get_index().select(self.industry, self.audience, [get_hook(k).name for k in hook_keys],
+                                           len(hook_keys), rng=self.rng)
+                return [HOOK_KEYS_BY_NAME[name] for name in names]
+            except sqlite3.Error as e:
+                log.warning("hook index unavailable, sampling uniformly", extra={"fields": {"error": str(e)}})
+        self.rng.shuffle(hook_keys)
+        return hook_keys
+
     def generate_variations_template(self, count=4):
         """
         Generate variations using template mode (fallback).
         """
-        all_hooks = get_all_hook_types()
-        selected_hooks = random.sample(all_hooks, min(count, len(all_hooks)))
+        selected_hooks = self._select_hooks(count)
         
         variations = []
         for i, hook_key in enumerate(selected_hooks, start=1):
@@ -154,13 +232,128 @@ class CopyEngine:
         
         return variations
 
+    def _least_similar_template(self, variation_id, used_hook_names, others, attempts=4):
+        """
+        Draw template variations from claim-free hooks - unused ones first,
+        each group in bandit order (_rank_hooks) - validate them, and keep the
+        one least similar to `others`. A draw that still breaks a rule after
+        repair is rejected and the next draw or hook is tried - some openers
+        name the client and can never pass. Returns (variation, signature).
+        """
+        unused = [k for k in CLAIM_FREE_HOOK_KEYS if get_hook(k).name not in used_hook_names]
+        used = [k for k in CLAIM_FREE_HOOK_KEYS if k not in unused]
+        best = fallback = None
+        for hook_key in self._rank_hooks(unused) + self._rank_hooks(used):
+            for _ in range(attempts):
+                candidate = self._generate_single_variation(hook_key, variation_id)
+                candidate, remaining = validate_variation(candidate, self.client_name, self.rng)
+                sig = signature(candidate)
+                similarity = max_similarity(sig, others)
+                if remaining:
+                    if fallback is None:
+                        fallback = (candidate, sig)
+                    continue
+                if best is None or similarity < best[2]:
+                    best = (candidate, sig, similarity)
+                if similarity < DUPLICATE_THRESHOLD:
+                    return candidate, sig
+            if best is not None:
+                return best[0], best[1]
+        log.warning("no template variation passed every rule", extra={"fields": {"client": self.client_name}})
+        return fallback
+
+    def _replace_near_duplicates(self, variations, source):
+        """
+        Swap near-duplicate variations - too close to an earlier slot in this
+        batch or to this client's recent history - for template variations.
+        Only the flagged slots change; the rest of the batch is kept as-is.
+        Seeded requests are replays, so they skip (and don't feed) the history.
+        """
+        with timer("dedupe"):
+            past = dedupe.history.get(self.client_name) if self.seed is None else []
+            used_hook_names = {v.get("hookType") for v in variations}
+            kept = []
+            for i, variation in enumerate(variations):
+                sig = signature(variation)
+                if max(max_similarity(sig, kept), max_similarity(sig, past)) >= DUPLICATE_THRESHOLD:
+                    inc("copygen_duplicates_total", source=source)
+                    variation, sig = self._least_similar_template(
+                        variation.get("id", i + 1), used_hook_names, kept + past)
+                    variations[i] = variation
+                    used_hook_names.add(variation["hookType"])
+                kept.append(sig)
+            if self.seed is None:
+                dedupe.history.add(self.client_name, kept)
+        return variations
+
+    def _enforce_rules(self, variations):
+        """
+        Check LLM variations against the prompt's hard rules. Breaks are
+        repaired locally where possible; the rest are re-requested one by one,
+        and anything still broken after that becomes a template variation.
+        """
+        broken = {}
+        with timer("validate"):
+            for i, variation in enumerate(variations):
+                violations = check(variation, self.client_name)
+                if not violations:
+                    continue
+                for rule in violations:
+                    inc("copygen_rule_violations_total", rule=rule)
+                repaired, remaining = repair(variation, self.client_name, self.rng)
+                if remaining:
+                    broken[i] = (variation, remaining)
+                else:
+                    variations[i] = repaired
+                    inc("copygen_repairs_total", outcome="local")
+        if not broken:
+            return variations
+        
+        if self._has_llm_time("skip_rewrite"):
+            rewritten = self._llm.rewrite_variations(self.client_name, self.audience, broken)
+        else:
+            rewritten = dict.fromkeys(broken)
+        used_hook_names = {v.get("hookType") for v in variations}
+        for i, variation in rewritten.items():
+            if variation is not None and check(variation, self.client_name):
+                variation, remaining = repair(variation, self.client_name, self.rng)
+                variation = None if remaining else variation
+            if variation is not None:
+                inc("copygen_repairs_total", outcome="rewritten")
+            else:
+                inc("copygen_repairs_total", outcome="template")
+                variation = self._least_similar_template(broken[i][0].get("id", i + 1), used_hook_names, [])[0]
+                used_hook_names.add(variation["hookType"])
+            variations[i] = variation
+        return variations
+
+    def _validate_batch(self, variations):
+        """
+        Final rule check over the assembled batch, swapped-in templates
+        included: repair what's broken, and replace what can't be repaired
+        with another (validated) template.
+        """
+        with timer("validate"):
+            used_hook_names = {v.get("hookType") for v in variations}
+            for i, variation in enumerate(variations):
+                variation, remaining = validate_variation(variation, self.client_name, self.rng)
+                if remaining:
+                    for rule in remaining:
+                        inc("copygen_rule_violations_total", rule=rule)
+                    inc("copygen_repairs_total", outcome="template")
+                    variation = self._least_similar_template(variation.get("id", i + 1), used_hook_names, [])[0]
+                    used_hook_names.add(variation["hookType"])
+                variations[i] = variation
+        return variations
+
     def generate_variations(self, count=4):
         """
         Generate `count` distinct email variations.
-        Uses Gemini Pro API when available, otherwise falls back to templates.
+        Uses Gemini Pro API when available, otherwise falls back to templates
+        (also when the deadline leaves no time for the model).
         """
         # Try Gemini first
-        if GEMINI_AVAILABLE:
+        if GEMINI_AVAILABLE and self.use_llm and self._has_llm_time("template"):
             try:
                 client = get_gemini_client()
                 result = client.generate_variations(
@@ -169,20 +362,90 @@ class CopyEngine:
                     self.audience,
                     self.website,
                     self.strategy,
-                    count
+                    count,
+                    tier=self.tier,
+                    seed=self.seed,
+                    session_id=self.session_id,
+                    deadline=self.deadline
                 )
-                print("✅ Generated variations using Gemini Pro")
-                return result["variations"]
+                log.info("generated variations using gemini")
+                self._llm = client
+                self.context = result.get("context")
+                self.model = result.get("model", self.model)
+                self.prompt_version = result.get("promptVersion", self.prompt_version)
+                variations = self._enforce_rules(result["variations"])
+                return self._validate_batch(self._replace_near_duplicates(variations, "llm"))
+            except DeadlineExceeded as e:
+                log.warning("no time left for the llm, falling back to templates",
+                            extra={"fields": {"error": str(e)}})
+                degrade("template")
+                inc("copygen_fallbacks_total", reason="deadline")
+                self.fallback = {"reason": "deadline", "error": str(e)}
+                if not self.template_fallback:
+                    raise
             except Exception as e:
-                print(f"⚠️ Gemini generation failed: {e}")
-                print("📝 Falling back to template mode...")
+                log.warning("gemini generation failed, falling back to templates",
+                            extra={"fields": {"error": str(e)}})
+                inc("copygen_fallbacks_total", reason="llm_error")
+                self.fallback = {"reason": "llm_error", "error": str(e)}
+                if not self.template_fallback:
+                    raise
+        else:
+            reason = "overload" if not self.use_llm else "llm_unavailable" if not GEMINI_AVAILABLE else "deadline"
+            inc("copygen_fallbacks_total", reason=reason)
+            self.fallback = {"reason": reason}
+            if not self.template_fallback:
+                raise RuntimeError(f"LLM not used ({reason}) and template fallback is off")
         
         # Fallback to template mode
-        print("📝 Using template mode for generation")
-        return self.generate_variations_template(count)
+        self._llm = None
+        log.info("using template mode for generation")
+        with timer("template_fallback"):
+            variations = self.generate_variations_template(count)
+        return self._replace_near_duplicates(variations, "template")
+
+    def _generate_follow_up_template(self, step):
+        """Template body for follow-up `step` (fallback mode)."""
+        follow_up = get_follow_up(step)
+        benefit = self._fill_template("there's a lighter fix for {problem} than most teams try")
+        return self._fill_template(self.rng.choice(follow_up.templates),
+                                   benefit=benefit, cta=self.rng.choice(follow_up.ctas))
+
+    def generate_sequences(self, count=4):
+        """
+        Generate `count` variations, each with follow-ups 1-3 under "followUps".
+        The LLM client from the initial generation writes the follow-ups, so the
+        scraped context and prompt prefix are reused rather than rebuilt; any
+        step it can't produce is filled from templates.
+        """
+        variations = self.generate_variations(count)
+        steps = sorted(FOLLOW_UP_STEPS)
+        
+        written = {}
+        use_llm = self._llm is not None and self._has_llm_time("template_follow_ups")
+        if use_llm:
+            with timer("follow_ups"):
+                written = self._llm.generate_follow_ups(self.client_name, self.audience, variations, steps)
+        for step in steps:
+            if use_llm and written.get(step) is None:
+                inc("copygen_fallbacks_total", reason="follow_up_error")
+        
+        for i, variation in enumerate(variations, start=1):
+            follow_ups = []
+            for step in steps:
+                body = (written.get(step) or {}).get(variation.get("id", i))
+                follow_ups.append({
+                    "step": step,
+                    "name": get_follow_up(step).name,
+                    "subject": f"Re: {variation.get('subject', '')}",
+                    "body": body or self._generate_follow_up_template(step),
+                })
+            variation["followUps"] = follow_ups
+        return variations
 
 
-def generate_copy(client_name, industry, audience, website, strategy, count=4):
+def generate_copy(client_name, industry, audience, website, strategy, count=4, request_id=None, sequence=False,
+                  tier="flash", seed=None, use_llm=True, session_id=None, deadline=None, template_fallback=True):
     """
     Main entry point for generating email copy.
     
@@ -193,11 +456,44 @@ def generate_copy(client_name, industry, audience, website, strategy, count=4):
         website: Client's website URL
         strategy: Strategy call notes/summary
         count: Number of variations to generate (default: 4)
+        request_id: Correlation ID for log lines (inherited from the caller if omitted)
+        sequence: Also write follow-ups 1-3 for each variation (default: False)
+        tier: Model tier - "flash" for drafts, "pro" for the larger model
+        seed: Makes template output reproducible (and the LLM as deterministic
+              as the provider allows) - same seed + same brief, same copy
+        use_llm: False serves template copy only (admission control under overload)
+        session_id: Wizard session, to reuse its /api/prefetch website analysis
+        deadline: Request budget (deadline.Deadline); stages share what's left and
+                  degrade - no scrape, short prompt, templates - rather than overrun
+        template_fallback: False raises when the LLM fails instead of serving
+                  template copy (bulk --batch, where a failed job must fail its rows)
     
     Returns:
-        dict with "variations" list
+        dict with "variations" list, the "generationId" it was stored under and
+        the "source" of the copy - "llm", or "template" with the "fallback"
+        reason (and error) when the LLM wasn't used or failed
     """
-    engine = CopyEngine(client_name, industry, audience, website, strategy)
-    variations = engine.generate_variations(count)
+    if request_id:
+        bind_request_id(request_id)
+    engine = CopyEngine(client_name, industry, audience, website, strategy, tier, seed, use_llm,
+                        session_id, deadline, template_fallback)
+    if sequence:
+        variations = engine.generate_sequences(count)
+    else:
+        variations = engine.generate_variations(count)
+    result = {"variations": variations, "source": "template" if engine.fallback else "llm"}
+    if engine.fallback:
+        result["fallback"] = engine.fallback
+    if not use_llm:
+        result["degraded"] = True
+    
+    # Persist asynchronously (write-behind); assigns each variation a variationId
+    store = get_store()
+    if store is not None:
+        brief = dict(client_name=client_name, industry=industry, audience=audience,
+                     website=website, strategy=strategy)
+        result["generationId"] = store.record_generation(
+            brief, variations, context=engine.context, prompt_version=engine.prompt_version,
+            model=engine.model, request_id=get_request_id())
     
-    return {"variations": variations}
+    return result
@@ -0,0 +1,6 @@
+"""
+Copy Generator - Command-line entry points for offline jobs.
+
+    python -m copy_generator bulk briefs.csv -o results.jsonl
+    python -m copy_generator refresh --once https://client.com
+"""
@@ -0,0 +1,31 @@
+"""
+python -m copy_generator <command> - see `--help` for the available commands.
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Progress goes to stderr; keep the JSON request logs to warnings and up
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# backend/.env, before any backend module reads its settings at import time
+load_dotenv()
+
+from copy_generator import bulk, refresh  # noqa: E402
+
+COMMANDS = (bulk, refresh)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m copy_generator", description="Offline copy generation jobs")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for command in COMMANDS:
+        command.add_parser(subparsers)
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+Bulk - Generate copy for a file of briefs without going through HTTP.
+
+    python -m copy_generator bulk briefs.csv -o results.jsonl --workers 8
+
+Input is CSV (with a header row) or JSONL, read one row at a time. Columns
+match the /api/generate body (clientName, industry, audience, website,
+strategy, sequence, tier, seed); snake_case names work too, and an optional
+`id` column is copied to the output. Each finished row is appended to the
+output JSONL as soon as it completes, so the output doubles as the
+checkpoint: rerunning with the same -o skips rows already written with
+status "ok" (matched on row number and a hash of the brief as run, --count
+and --sequence included). Rows the engine had to serve from templates -
+provider errors, failed batch jobs, no time left - are written with status
+"degraded" and the fallback reason, so a rerun tries them again.
+
+With --batch, model calls go out as batch jobs instead (batch.py; Gemini
+batch mode, or BATCH_BASE_URL): every worker's prompt joins the next job
+and waits for it, so --workers (default BATCH_MAX_SIZE) is also roughly
+the job size. Slower per row, far fewer API calls and cheaper tokens. A
+failed or expired job fails its rows (status "error" with the job's error)
+rather than falling back to template copy.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from batch import BATCH_MAX_SIZE, batch_providers_from_env
+from copy_engine import generate_copy
+from history_store import get_store
+from providers import DEFAULT_TIER, TIERS, Router, set_router
+
+# Input column -> generate_copy() argument
+FIELDS = {
+    "clientName": "client_name",
+    "industry": "industry",
+    "audience": "audience",
+    "website": "website",
+    "strategy": "strategy",
+    "sequence": "sequence",
+    "tier": "tier",
+    "seed": "seed",
+}
+REQUIRED = ("client_name", "industry", "website", "strategy")
+TRUE_STRINGS = ("1", "true", "yes", "y")
+
+
+# ============ INPUT ============
+
+def _format_of(path, fmt):
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def read_records(path, fmt=None):
+    """Yield (row number, record dict) from a CSV or JSONL file ("-" = stdin), streaming."""
+    stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+    try:
+        if _format_of(path, fmt) == "csv":
+            yield from enumerate(csv.DictReader(stream), start=1)
+            return
+        row = 0
+        for line in stream:
+            if not line.strip():
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = {"_error": f"invalid JSON: {e}"}
+            yield row, record if isinstance(record, dict) else {"_error": "row is not a JSON object"}
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def count_records(path, fmt=None):
+    """Rows in the input (for the ETA); None when reading stdin."""
+    if path == "-":
+        return None
+    with open(path, newline="", encoding="utf-8") as f:
+        if _format_of(path, fmt) == "csv":
+            return sum(1 for _ in csv.DictReader(f))
+        return sum(1 for line in f if line.strip())
+
+
+def to_brief(record):
+    """generate_copy() keyword arguments for an input record; raises ValueError if invalid."""
+    if "_error" in record:
+        raise ValueError(record["_error"])
+    names = set(FIELDS.values())
+    brief = {}
+    for key, value in record.items():
+        name = FIELDS.get(key, key if key in names else None)
+        if name is not None and value not in (None, ""):
+            brief[name] = value
+    missing = [f for f in REQUIRED if not brief.get(f)]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    brief.setdefault("audience", "")
+    if isinstance(brief.get("sequence"), str):
+        brief["sequence"] = brief["sequence"].strip().lower() in TRUE_STRINGS
+    if brief.setdefault("tier", DEFAULT_TIER) not in TIERS:
+        raise ValueError(f"tier must be one of {', '.join(TIERS)}")
+    if "seed" in brief:
+        try:
+            brief["seed"] = int(brief["seed"])
+        except (TypeError, ValueError):
+            raise ValueError("seed must be an integer")
+    return brief
+
+
+def brief_hash(brief):
+    return hashlib.sha1(json.dumps(brief, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+# ============ CHECKPOINT ============
+
+def load_checkpoint(path):
+    """(row, briefHash) pairs already written with status "ok" to the output file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash; that row simply runs again
+                continue
+            if entry.get("status") == "ok":
+                done.add((entry.get("row"), entry.get("briefHash")))
+    return done
+
+
+def open_output(path):
+    """Open the output for appending, terminating a partial last line left by a crash."""
+    out = open(path, "a+", encoding="utf-8")
+    if out.tell() > 0:
+        out.seek(out.tell() - 1)
+        if out.read(1) != "\n":
+            out.write("\n")
+    return out
+
+
+# ============ PROGRESS ============
+
+class Progress:
+    """Throughput and ETA lines on stderr, at most every `interval` seconds."""
+
+    def __init__(self, total, interval=5.0, stream=sys.stderr):
+        self.total = total
+        self.interval = interval
+        self.stream = stream
+        self.ok = 0
+        self.degraded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.start = time.monotonic()
+        self._last = 0.0
+
+    @property
+    def finished(self):
+        return self.ok + self.degraded + self.failed
+
+    def record(self, status):
+        if status == "ok":
+            self.ok += 1
+        elif status == "degraded":
+            self.degraded += 1
+        else:
+            self.failed += 1
+        self.report()
+
+    def report(self, final=False):
+        now = time.monotonic()
+        if not final and now - self._last < self.interval:
+            return
+        self._last = now
+        elapsed = max(now - self.start, 1e-9)
+        rate = self.finished / elapsed
+        line = f"[bulk] {self.finished + self.skipped}"
+        if self.total is not None:
+            line += f"/{self.total}"
+        line += (f" rows ({self.ok} ok, {self.degraded} degraded, {self.failed} failed, {self.skipped} already done)"
+                 f" {rate:.2f} rows/s")
+        if self.total is not None and not final:
+            remaining = self.total - self.skipped - self.finished
+            line += f", ETA {_duration(remaining / rate) if rate else '?'}"
+        if final:
+            line += f" in {_duration(elapsed)}"
+        print(line, file=self.stream, flush=True)
+
+
+def _duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+# ============ RUN ============
+
+def _generate(row, brief, template_fallback=True):
+    return generate_copy(request_id=f"bulk-{row}", template_fallback=template_fallback, **brief)
+
+
+def _finish(entry, result):
+    """Fill in a finished row: "ok" for LLM copy, "degraded" for a template fallback."""
+    fallback = result.get("fallback")
+    if fallback is None:
+        entry.update(status="ok", result=result)
+        return
+    error = fallback["reason"] + (f": {fallback['error']}" if fallback.get("error") else "")
+    entry.update(status="degraded", error=error, result=result)
+
+
+def _write(out, entry):
+    out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    out.flush()
+
+
+def run(args):
+    if args.batch:
+        providers = batch_providers_from_env()
+        if not providers:
+            print("[bulk] --batch needs GEMINI_API_KEY or BATCH_BASE_URL", file=sys.stderr)
+            return 2
+        set_router(Router(providers))
+    workers = args.workers or (BATCH_MAX_SIZE if args.batch else 4)
+    output = args.output or os.path.splitext(args.input if args.input != "-" else "bulk")[0] + ".out.jsonl"
+    done = load_checkpoint(output)
+    progress = Progress(count_records(args.input, args.format), interval=args.progress_interval)
+    max_pending = workers * 2
+    pending = {}
+    interrupted = False
+
+    def drain(block_until):
+        finished, _ = wait(pending, return_when=block_until)
+        for future in finished:
+            entry = pending.pop(future)
+            try:
+                _finish(entry, future.result())
+            except Exception as e:
+                entry.update(status="error", error=str(e))
+            _write(out, entry)
+            progress.record(entry["status"])
+
+    with open_output(output) as out, ThreadPoolExecutor(max_workers=workers,
+                                                        thread_name_prefix="bulk") as pool:
+        try:
+            for row, record in read_records(args.input, args.format):
+                entry = {"row": row, "id": record.get("id")}
+                try:
+                    brief = to_brief(record)
+                except ValueError as e:
+                    _write(out, dict(entry, status="error", error=str(e)))
+                    progress.record("error")
+                    continue
+                # Hash what actually runs, so changing --count/--sequence re-runs the rows
+                brief.setdefault("count", args.count)
+                brief["sequence"] = bool(args.sequence or brief.get("sequence"))
+                entry["briefHash"] = brief_hash(brief)
+                if (row, entry["briefHash"]) in done:
+                    progress.skipped += 1
+                    continue
+                while len(pending) >= max_pending:
+                    drain(FIRST_COMPLETED)
+                pending[pool.submit(_generate, row, brief, not args.batch)] = entry
+            while pending:
+                drain(FIRST_COMPLETED)
+        except KeyboardInterrupt:
+            # Keep what's already running; rows never started run on resume
+            interrupted = True
+            print("[bulk] interrupted - finishing rows in flight (Ctrl-C again to abort)",
+                  file=sys.stderr, flush=True)
+            for future in list(pending):
+                if future.cancel():
+                    del pending[future]
+            if pending:
+                drain(ALL_COMPLETED)
+
+    store = get_store()
+    if store is not None:
+        store.flush()
+    progress.report(final=True)
+    print(f"[bulk] results in {output}", file=sys.stderr)
+    if interrupted:
+        return 130
+    return 1 if progress.failed or progress.degraded else 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser("bulk", help="generate copy for every brief in a CSV/JSONL file",
+                                   description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="briefs file (.csv or .jsonl, - for stdin)")
+    parser.add_argument("-o", "--output", help="results JSONL, also the resume checkpoint "
+                                               "(default: <input>.out.jsonl)")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="input format (default: from extension)")
+    parser.add_argument("--workers", type=int, help="concurrent generations (default: 4, BATCH_MAX_SIZE with --batch)")
+    parser.add_argument("--count", type=int, default=4, help="variations per brief")
+    parser.add_argument("--sequence", action="store_true", help="also write follow-ups 1-3 for every brief")
+    parser.add_argument("--batch", action="store_true", help="send model calls as deferred batch jobs")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="seconds between progress lines")
+    parser.set_defaults(run=run)
+    return parser
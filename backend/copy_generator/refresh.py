@@ -0,0 +1,76 @@
+"""
+Refresh - Re-crawl client websites into the context cache.
+
+    python -m copy_generator refresh --once https://client-a.com https://client-b.com
+    python -m copy_generator refresh --urls-file clients.txt
+
+Without URLs, uses CONTEXT_REFRESH_URLS / CONTEXT_REFRESH_FILE. --once
+refreshes each URL a single time (cron-style) and exits; otherwise it keeps
+refreshing on the CONTEXT_REFRESH_INTERVAL schedule, as the in-process
+scheduler does, and shares its lock so only one of them crawls at a time.
+"""
+
+import argparse
+import sys
+import threading
+
+import refresh as scheduler
+from context_cache import get_context_cache
+
+
+def run(args):
+    urls = list(args.urls)
+    if args.urls_file:
+        urls += scheduler.load_urls("", args.urls_file)
+    urls = list(dict.fromkeys(urls)) or scheduler.load_urls()
+    if not urls:
+        print("[refresh] no URLs: pass them, --urls-file, or set CONTEXT_REFRESH_URLS", file=sys.stderr)
+        return 2
+    cache = get_context_cache()
+    if cache is None:
+        print("[refresh] the context cache is disabled (CONTEXT_CACHE_ENABLED=0)", file=sys.stderr)
+        return 2
+
+    # --once starts right away; the loop keeps the usual first-pass spread
+    jitter = 0.0 if args.once else args.jitter
+    job = scheduler.RefreshScheduler(urls, interval=args.interval, jitter=jitter,
+                                     host_delay=args.host_delay, cache=cache)
+    stop = threading.Event()
+    if args.once:
+        try:
+            results = job.run_once(stop)
+        except KeyboardInterrupt:
+            return 130
+        for url, status in results.items():
+            print(f"{status:<10} {url}")
+        return 1 if "error" in results.values() else 0
+
+    lock = scheduler.LeaderLock()
+    try:
+        while not lock.acquire():
+            print(f"[refresh] another process holds {lock.path}; retrying in {scheduler.LEADER_RETRY:.0f}s",
+                  file=sys.stderr, flush=True)
+            stop.wait(scheduler.LEADER_RETRY)
+        print(f"[refresh] refreshing {len(urls)} URLs every ~{args.interval:.0f}s", file=sys.stderr, flush=True)
+        job.run(stop)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        lock.release()
+    return 0
+
+
+def add_parser(subparsers):
+    parser = subparsers.add_parser("refresh", help="re-crawl client websites into the context cache",
+                                   description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("urls", nargs="*", help="URLs to refresh (default: CONTEXT_REFRESH_URLS/FILE)")
+    parser.add_argument("--urls-file", help="file with one URL per line")
+    parser.add_argument("--once", action="store_true", help="refresh each URL once and exit")
+    parser.add_argument("--interval", type=float, default=scheduler.CONTEXT_REFRESH_INTERVAL,
+                        help="seconds between refreshes of a URL")
+    parser.add_argument("--jitter", type=float, default=scheduler.CONTEXT_REFRESH_JITTER,
+                        help="random +/- fraction of the interval")
+    parser.add_argument("--host-delay", type=float, default=scheduler.CONTEXT_REFRESH_HOST_DELAY,
+                        help="minimum seconds between fetches from one host")
+    parser.set_defaults(run=run)
+    return parser
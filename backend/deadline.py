@@ -0,0 +1,85 @@
+"""
+Deadline - Request-scoped time budget for /api/generate.
+Created once per request (X-Request-Timeout header, else REQUEST_TIMEOUT)
+and passed down generate_copy -> CopyEngine -> GeminiClient ->
+analyze_website and the providers. Each stage takes a share of what's left
+instead of a fixed timeout, and the engine degrades rather than overruns:
+no scrape, then a short prompt, then template copy.
+"""
+
+import os
+import time
+
+from metrics import inc
+
+# Budget when the caller doesn't send one, and the most a caller may ask for
+# (gunicorn's worker timeout is sized from LLM_DEADLINE, so stay under it)
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "30"))
+MAX_REQUEST_TIMEOUT = float(os.getenv("MAX_REQUEST_TIMEOUT", os.getenv("LLM_DEADLINE", "60")))
+
+# Below this much time left the LLM isn't tried at all (template copy)
+MIN_LLM_SECONDS = float(os.getenv("DEADLINE_MIN_LLM", "3"))
+# Below this the prompt drops the long framework for its cheatsheet
+FULL_PROMPT_SECONDS = float(os.getenv("DEADLINE_FULL_PROMPT", "10"))
+# The website may use up to this share of what's left; with under MIN_SCRAPE_SECONDS it's skipped
+SCRAPE_SHARE = 0.3
+MIN_SCRAPE_SECONDS = 1.0
+MAX_SCRAPE_SECONDS = 10.0
+# Kept back for validation, dedupe and writing the response
+RESERVE_SECONDS = 0.5
+
+
+class DeadlineExceeded(TimeoutError):
+    """Not enough of the request's budget left for the stage about to run."""
+
+
+class Deadline:
+    """An absolute point on the monotonic clock, with helpers for splitting what's left."""
+
+    __slots__ = ("at", "clock")
+
+    def __init__(self, seconds, clock=time.monotonic):
+        self.clock = clock
+        self.at = clock() + seconds
+
+    @classmethod
+    def from_header(cls, value):
+        """
+        Deadline from an X-Request-Timeout value in seconds (REQUEST_TIMEOUT when
+        absent), capped at MAX_REQUEST_TIMEOUT; raises ValueError if malformed.
+        """
+        if value in (None, ""):
+            return cls(REQUEST_TIMEOUT)
+        seconds = float(value)
+        if not seconds > 0:
+            raise ValueError("X-Request-Timeout must be a positive number of seconds")
+        return cls(min(seconds, MAX_REQUEST_TIMEOUT))
+
+    def remaining(self):
+        return max(0.0, self.at - self.clock())
+
+    def expired(self):
+        return self.clock() >= self.at
+
+    def budget(self, share=1.0, cap=None, reserve=RESERVE_SECONDS):
+        """Seconds a stage may spend: `share` of what's left after the reserve, at most `cap`."""
+        seconds = max(0.0, self.remaining() - reserve) * share
+        return seconds if cap is None else min(seconds, cap)
+
+    def child(self, share=1.0, cap=None, reserve=RESERVE_SECONDS):
+        """A sub-deadline for one stage, never later than this one."""
+        child = Deadline.__new__(Deadline)
+        child.clock = self.clock
+        child.at = self.clock() + self.budget(share, cap, reserve)
+        return child
+
+    def check(self, stage, need=0.0):
+        """Raise DeadlineExceeded unless at least `need` seconds (after the reserve) are left."""
+        if self.budget() <= need:
+            inc("copygen_deadline_total", stage=stage)
+            raise DeadlineExceeded(f"no time left for {stage} ({self.remaining():.2f}s remaining)")
+
+
+def degrade(step):
+    """Count one degradation step taken to stay inside a deadline."""
+    inc("copygen_degraded_total", step=step)
@@ -0,0 +1,81 @@
+"""
+Dedupe - Near-duplicate detection across generated variations.
+Each variation's subject+body is reduced to a set of hashed character shingles;
+Jaccard similarity against the rest of the batch and a rolling per-client
+history flags paraphrases before they reach the user; CopyEngine swaps the
+flagged slots for fresh template variations.
+"""
+
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict, deque
+
+SHINGLE_SIZE = 5
+# Calibrated on template output: different hooks score <= 0.25, a shared
+# opener or frame-flip line pushes pairs past ~0.6
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.6"))
+HISTORY_PER_CLIENT = int(os.getenv("DUPLICATE_HISTORY_PER_CLIENT", "40"))
+MAX_CLIENTS = int(os.getenv("DUPLICATE_HISTORY_MAX_CLIENTS", "1000"))
+
+_PLACEHOLDER_RE = re.compile(r"\{\{?\s*\w+\s*\}?\}")
+_NON_WORD_RE = re.compile(r"[^a-z0-9 ]+")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def signature(variation):
+    """Hashed character shingles of the normalized subject + body."""
+    text = f"{variation.get('subject', '')} {variation.get('body', '')}".lower()
+    text = _PLACEHOLDER_RE.sub(" ", text)
+    text = _NON_WORD_RE.sub(" ", text)
+    text = _SPACE_RE.sub(" ", text).strip()
+    if len(text) < SHINGLE_SIZE:
+        return frozenset([zlib.crc32(text.encode())])
+    return frozenset(zlib.crc32(text[i:i + SHINGLE_SIZE].encode())
+                     for i in range(len(text) - SHINGLE_SIZE + 1))
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared)
+
+
+def max_similarity(sig, others):
+    return max((jaccard(sig, other) for other in others), default=0.0)
+
+
+class ClientHistory:
+    """Rolling window of recent signatures per client, LRU-bounded across clients."""
+
+    def __init__(self, per_client=HISTORY_PER_CLIENT, max_clients=MAX_CLIENTS):
+        self.per_client = per_client
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._clients = OrderedDict()
+
+    @staticmethod
+    def key(client_name):
+        return (client_name or "").strip().lower()
+
+    def get(self, client_name):
+        with self._lock:
+            window = self._clients.get(self.key(client_name))
+            return list(window) if window else []
+
+    def add(self, client_name, signatures):
+        key = self.key(client_name)
+        with self._lock:
+            window = self._clients.get(key)
+            if window is None:
+                window = self._clients[key] = deque(maxlen=self.per_client)
+            self._clients.move_to_end(key)
+            window.extend(signatures)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+
+
+history = ClientHistory()
+
@@ -0,0 +1,110 @@
+"""
+Gunicorn configuration - production entry point for the backend.
+
+    cd backend && gunicorn -c gunicorn.conf.py app:app
+
+Requests spend almost all of their time waiting on the LLM, with a short
+CPU-bound burst for HTML parsing. So: a few processes (CPU parallelism for
+parsing) times many threads (cheap waiting on I/O).
+
+Defaults come from `python -m bench.serve` + `python -m bench.run --url ...`
+(fake LLM ~1.9s per call, fixture homepages, 64 requests per point) on a
+1-vCPU container; ranges are over two sweeps:
+
+    workers x threads   c=16 rps   c=16 p95    c=32 rps   c=32 p95
+    1 x 16              3.4-4.9    4.0-7.7s    4.2-4.6    8.2-8.9s
+    1 x 32                 5.0       4.6s        5.2        6.9s
+    2 x 8                  3.7       7.3s        3.7       10.6s
+    2 x 16              4.1-4.3    4.2-4.6s    4.6-5.3    7.4-7.5s
+    3 x 16                 4.2       4.7s        4.4        8.2s
+
+One core saturates at ~5 rps on HTML parsing whatever the worker model, so
+processes beyond cores+1 only add memory, while too few total threads (2 x 8)
+queues requests behind LLM waits. Hence workers = cores + 1, threads = 16.
+
+Each worker also owns PARSE_WORKERS spawned parse processes (parse_pool.py),
+started in post_worker_init, so HTML parsing never holds a request thread's GIL.
+Workers also start the background website refresh (refresh.py) there; one
+of them wins its lock and does the crawling.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from dotenv import load_dotenv
+
+# backend/.env applies to the settings below and, inherited, to the app
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+PORT = os.getenv("PORT", "5001")
+
+# The slowest thing a request waits on; worker timeouts must exceed it
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "60"))
+
+# Per-worker metric snapshots are merged by /api/metrics
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR",
+                      os.path.join(tempfile.gettempdir(), f"copygen-metrics-{PORT}"))
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{PORT}")
+
+# gthread by default; set GUNICORN_WORKER_CLASS=gevent (and install gevent)
+# for very high fan-in of slow LLM calls
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "200"))  # gevent only
+
+# Let an in-flight LLM call finish before a worker is killed or recycled
+timeout = int(LLM_DEADLINE + 30)
+graceful_timeout = int(LLM_DEADLINE + 15)
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = 100
+
+# Import the app (hook tables, framework prompt, bs4/genai) once in the master
+# so workers fork with it already loaded and shared copy-on-write
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info").lower()
+
+
+def on_starting(server):
+    """Drop metric snapshots left over from a previous run."""
+    shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+
+
+def post_fork(server, worker):
+    """Threads don't survive fork(); restart the log listener in each worker."""
+    from structured_logging import restart_listener
+    restart_listener()
+
+
+def post_worker_init(worker):
+    """Start this worker's parse processes before it takes traffic."""
+    from parse_pool import get_parse_pool
+    from refresh import start_background_refresh
+    pool = get_parse_pool()
+    if pool is not None:
+        pool.warm()
+    start_background_refresh()
+
+
+def worker_exit(server, worker):
+    """
+    Stop background work, write out queued history, then fold this worker's
+    metrics into the exited snapshot.
+    """
+    from history_store import flush_store
+    from metrics import registry
+    from parse_pool import shutdown_parse_pool
+    from refresh import stop_background_refresh
+    stop_background_refresh()
+    shutdown_parse_pool()
+    flush_store()
+    registry.retire()
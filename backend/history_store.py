@@ -0,0 +1,293 @@
+"""
+History Store - Persists every brief, scraped context and variation in SQLite.
+Writes are queued and inserted in batches by a background thread (write-behind),
+so recording a generation never adds latency to /api/generate. Whatever is
+still queued is written out when the process exits (gunicorn worker_exit,
+atexit).
+"""
+
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from metrics import inc
+from structured_logging import get_logger
+
+log = get_logger("history_store")
+
+HISTORY_ENABLED = os.getenv("HISTORY_ENABLED", "1") != "0"
+HISTORY_DB_PATH = os.getenv(
+    "HISTORY_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "history.db"),
+)
+BATCH_SIZE = 200
+FLUSH_INTERVAL = 0.5
+MAX_PENDING = 10000
+# Longest an exiting process waits for queued writes
+EXIT_FLUSH_TIMEOUT = 5.0
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    client TEXT NOT NULL,
+    client_key TEXT NOT NULL,
+    industry TEXT,
+    industry_key TEXT,
+    audience TEXT,
+    website TEXT,
+    strategy TEXT,
+    context_json TEXT,
+    prompt_version TEXT,
+    model TEXT,
+    request_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_generations_client ON generations (client_key, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_generations_industry ON generations (industry_key, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_generations_created ON generations (created_at DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS variations (
+    id TEXT PRIMARY KEY,
+    generation_id TEXT NOT NULL REFERENCES generations (id),
+    slot INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    client_key TEXT NOT NULL,
+    industry_key TEXT,
+    audience TEXT,
+    hook_type TEXT,
+    subject TEXT,
+    body TEXT,
+    ps TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_variations_generation ON variations (generation_id, slot);
+CREATE INDEX IF NOT EXISTS idx_variations_hook ON variations (hook_type, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_variations_client ON variations (client_key, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_variations_industry ON variations (industry_key, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_variations_industry_hook ON variations (industry_key, hook_type, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_variations_created ON variations (created_at DESC, id DESC);
+"""
+
+GENERATION_COLUMNS = ("id", "created_at", "client", "client_key", "industry", "industry_key", "audience",
+                      "website", "strategy", "context_json", "prompt_version", "model", "request_id")
+VARIATION_COLUMNS = ("id", "generation_id", "slot", "created_at", "client_key", "industry_key", "audience",
+                     "hook_type", "subject", "body", "ps")
+
+
+def normalize_key(value):
+    """Lookup key for free-text fields like client and industry."""
+    return " ".join((value or "").lower().split())
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def encode_cursor(row):
+    return f"{row['created_at']!r}_{row['id']}"
+
+
+def decode_cursor(cursor):
+    """Keyset cursor -> (created_at, id), or None if malformed."""
+    try:
+        created_at, row_id = cursor.split("_", 1)
+        return float(created_at), row_id
+    except (AttributeError, ValueError):
+        return None
+
+
+class HistoryStore:
+    """SQLite-backed history with a write-behind insert queue."""
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with _connect(path) as conn:
+            conn.executescript(SCHEMA)
+        self._pending = queue.Queue(maxsize=MAX_PENDING)
+        self._local = threading.local()
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    # ============ WRITES ============
+
+    def record_generation(self, brief, variations, context=None, prompt_version=None, model=None,
+                          request_id=None):
+        """
+        Queue a generation and its variations for insertion. Assigns a
+        `variationId` to each variation (in place) and returns the generation ID.
+        Never blocks: if the queue is full the record is dropped and counted.
+        """
+        generation_id = uuid.uuid4().hex
+        now = time.time()
+        client_key = normalize_key(brief.get("client_name"))
+        industry_key = normalize_key(brief.get("industry"))
+
+        generation = (
+            generation_id, now, brief.get("client_name") or "", client_key,
+            brief.get("industry"), industry_key, brief.get("audience"), brief.get("website"),
+            brief.get("strategy"), json.dumps(context) if context else None,
+            prompt_version, model, request_id,
+        )
+        rows = []
+        for slot, variation in enumerate(variations, start=1):
+            variation_id = variation.setdefault("variationId", uuid.uuid4().hex)
+            rows.append((
+                variation_id, generation_id, slot, now, client_key, industry_key, brief.get("audience"),
+                variation.get("hookType"), variation.get("subject"), variation.get("body"), variation.get("ps"),
+            ))
+
+        try:
+            self._pending.put_nowait((generation, rows))
+        except queue.Full:
+            inc("copygen_history_dropped_total")
+            log.warning("history queue full, dropping generation",
+                        extra={"fields": {"generation_id": generation_id}})
+        return generation_id
+
+    def flush(self, timeout=None):
+        """
+        Block until everything queued so far has been written, or at most
+        `timeout` seconds; returns False if writes were still pending.
+        """
+        if timeout is None:
+            self._pending.join()
+            return True
+        give_up = time.monotonic() + timeout
+        with self._pending.all_tasks_done:
+            while self._pending.unfinished_tasks:
+                remaining = give_up - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._pending.all_tasks_done.wait(remaining)
+        return True
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    conn.executemany(
+                        f"INSERT OR IGNORE INTO generations VALUES ({','.join('?' * len(GENERATION_COLUMNS))})",
+                        [generation for generation, _ in batch])
+                    conn.executemany(
+                        f"INSERT OR IGNORE INTO variations VALUES ({','.join('?' * len(VARIATION_COLUMNS))})",
+                        [row for _, rows in batch for row in rows])
+            except sqlite3.Error as e:
+                inc("copygen_errors_total", stage="history_write")
+                log.error("history batch insert failed", extra={"fields": {"error": str(e), "size": len(batch)}})
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    # ============ READS ============
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        return conn
+
+    def _page(self, table, columns, filters, limit, cursor):
+        limit = max(1, min(int(limit or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE))
+        where = [f"{column} = ?" for column, _ in filters]
+        params = [value for _, value in filters]
+        position = decode_cursor(cursor) if cursor else None
+        if position:
+            where.append("(created_at, id) < (?, ?)")
+            params.extend(position)
+        sql = f"SELECT {', '.join(columns)} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = self._reader().execute(sql, params + [limit + 1]).fetchall()
+        next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+        return [dict(row) for row in rows[:limit]], next_cursor
+
+    def list_generations(self, client=None, industry=None, limit=None, cursor=None):
+        """Newest-first page of generations, optionally filtered by client and/or industry."""
+        filters = []
+        if client:
+            filters.append(("client_key", normalize_key(client)))
+        if industry:
+            filters.append(("industry_key", normalize_key(industry)))
+        columns = [c for c in GENERATION_COLUMNS if c not in ("client_key", "industry_key", "context_json")]
+        return self._page("generations", columns, filters, limit, cursor)
+
+    def list_variations(self, client=None, industry=None, hook_type=None, limit=None, cursor=None):
+        """Newest-first page of variations, filtered by client, industry and/or hook type."""
+        filters = []
+        if client:
+            filters.append(("client_key", normalize_key(client)))
+        if industry:
+            filters.append(("industry_key", normalize_key(industry)))
+        if hook_type:
+            filters.append(("hook_type", hook_type))
+        return self._page("variations", VARIATION_COLUMNS, filters, limit, cursor)
+
+    def get_generation(self, generation_id):
+        """A generation with its context and variations, or None."""
+        conn = self._reader()
+        row = conn.execute("SELECT * FROM generations WHERE id = ?", (generation_id,)).fetchone()
+        if row is None:
+            return None
+        generation = dict(row)
+        generation["context"] = json.loads(generation.pop("context_json") or "null")
+        generation["variations"] = [dict(v) for v in conn.execute(
+            "SELECT * FROM variations WHERE generation_id = ? ORDER BY slot", (generation_id,))]
+        return generation
+
+    def get_variation(self, variation_id):
+        row = self._reader().execute("SELECT * FROM variations WHERE id = ?", (variation_id,)).fetchone()
+        return dict(row) if row else None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Process-wide store, created on first use (None when HISTORY_ENABLED=0)."""
+    global _store
+    if not HISTORY_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = HistoryStore()
+    return _store
+
+
+def flush_store(timeout=EXIT_FLUSH_TIMEOUT):
+    """Write out this process's queued generations before it exits."""
+    store = _store
+    # A store inherited across fork has no writer thread in this process
+    if store is None or not store._writer.is_alive():
+        return
+    if not store.flush(timeout):
+        log.warning("history writes still queued at exit",
+                    extra={"fields": {"pending": store._pending.unfinished_tasks}})
+
+
+atexit.register(flush_store)
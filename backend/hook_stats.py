@@ -0,0 +1,147 @@
+"""
+Hook Stats - Cross-client performance index for hook types / angles.
+Outcome events (sent/open/reply) per variation roll up into an aggregate keyed
+by industry x audience x hook type, and a Thompson-sampling selector uses it
+to pick which angles to generate.
+"""
+
+import os
+import random
+import sqlite3
+import threading
+import time
+
+from history_store import HISTORY_DB_PATH, normalize_key
+from metrics import inc
+from structured_logging import get_logger
+
+log = get_logger("hook_stats")
+
+OUTCOME_EVENTS = ("sent", "open", "reply")
+# Minimum sends before a segment's own numbers are trusted over the broader level
+MIN_SEGMENT_SENDS = 20
+# How often each worker reloads the aggregate written by other workers
+REFRESH_INTERVAL = 30.0
+ANY = "*"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hook_outcomes (
+    industry_key TEXT NOT NULL,
+    audience_key TEXT NOT NULL,
+    hook_type TEXT NOT NULL,
+    sends INTEGER NOT NULL DEFAULT 0,
+    opens INTEGER NOT NULL DEFAULT 0,
+    replies INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (industry_key, audience_key, hook_type)
+);
+"""
+
+_COLUMN_FOR_EVENT = {"sent": "sends", "open": "opens", "reply": "replies"}
+
+
+class HookIndex:
+    """
+    Aggregate outcome counts at three levels - (industry, audience, hook),
+    (industry, *, hook) and (*, *, hook) - so sparse segments can back off
+    to broader evidence.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._counts = {}
+        self._loaded_at = 0.0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _levels(industry_key, audience_key, hook_type):
+        return ((industry_key, audience_key, hook_type),
+                (industry_key, ANY, hook_type),
+                (ANY, ANY, hook_type))
+
+    def record(self, industry, audience, hook_type, event, count=1):
+        """Add `count` outcome events for a hook type in a segment."""
+        column = _COLUMN_FOR_EVENT[event]
+        keys = self._levels(normalize_key(industry), normalize_key(audience), hook_type)
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                f"""INSERT INTO hook_outcomes (industry_key, audience_key, hook_type, {column}, updated_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (industry_key, audience_key, hook_type)
+                    DO UPDATE SET {column} = {column} + excluded.{column}, updated_at = excluded.updated_at""",
+                [(*key, count, now) for key in keys])
+        with self._lock:
+            for key in keys:
+                counts = self._counts.setdefault(key, {"sends": 0, "opens": 0, "replies": 0})
+                counts[column] += count
+        inc("copygen_outcomes_total", value=count, event=event)
+
+    def _refresh(self):
+        if time.monotonic() - self._loaded_at < REFRESH_INTERVAL:
+            return
+        try:
+            with self._connect() as conn:
+                rows = conn.execute("SELECT * FROM hook_outcomes").fetchall()
+        except sqlite3.Error as e:
+            log.warning("could not load hook outcomes", extra={"fields": {"error": str(e)}})
+            return
+        counts = {(r["industry_key"], r["audience_key"], r["hook_type"]):
+                  {"sends": r["sends"], "opens": r["opens"], "replies": r["replies"]} for r in rows}
+        with self._lock:
+            self._counts = counts
+            self._loaded_at = time.monotonic()
+
+    def counts_for(self, industry, audience, hook_type):
+        """Counts from the most specific level with enough sends (or the broadest one)."""
+        self._refresh()
+        keys = self._levels(normalize_key(industry), normalize_key(audience), hook_type)
+        with self._lock:
+            for key in keys:
+                counts = self._counts.get(key)
+                if counts and counts["sends"] >= MIN_SEGMENT_SENDS:
+                    return dict(counts)
+            return dict(self._counts.get(keys[-1]) or {"sends": 0, "opens": 0, "replies": 0})
+
+    def segment(self, industry, audience):
+        """All hook types with data for a segment, with their backed-off counts."""
+        self._refresh()
+        with self._lock:
+            hook_types = {key[2] for key in self._counts}
+        return {hook: self.counts_for(industry, audience, hook) for hook in sorted(hook_types)}
+
+    def select(self, industry, audience, candidates, k, rng=random):
+        """
+        Thompson sampling: draw a reply rate for each candidate from
+        Beta(1 + replies, 1 + sends - replies) and return the top `k`.
+        With no data every candidate gets Beta(1, 1), i.e. a uniform random pick.
+        """
+        draws = []
+        for name in candidates:
+            counts = self.counts_for(industry, audience, name)
+            sends = max(counts["sends"], counts["replies"])
+            draws.append((rng.betavariate(1 + counts["replies"], 1 + sends - counts["replies"]), name))
+        draws.sort(reverse=True)
+        return [name for _, name in draws[:k]]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = HookIndex()
+    return _index
+
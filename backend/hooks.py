@@ -1,124 +1,233 @@
 """
 Hook Types & Angle Database
 Based on the 1M Messages copywriting framework.
+Records are immutable NamedTuples holding tuples of interned template strings,
+built once at import and shared by every request.
 """
 
-HOOK_TYPES = {
-    "shot_in_the_dark": {
-        "name": "Shot in the Dark",
-        "description": "Frame it as unlikely but potentially helpful",
-        "subject_templates": [
+import sys
+from typing import NamedTuple
+
+
+class Hook(NamedTuple):
+    """One angle: subject/opener templates plus the frame-flip line for the body."""
+    key: str
+    name: str
+    description: str
+    subject_templates: tuple
+    opener_templates: tuple
+    frame_flip: str
+
+
+class FollowUpStep(NamedTuple):
+    """One step of the follow-up sequence."""
+    step: int
+    name: str
+    description: str
+    templates: tuple
+    ctas: tuple
+
+
+def _interned(record):
+    """Intern every string in a record (including inside its tuples)."""
+    def intern(value):
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, tuple):
+            return tuple(intern(v) for v in value)
+        return value
+    return record._make(intern(v) for v in record)
+
+
+HOOK_TYPES = {hook.key: _interned(hook) for hook in (
+    Hook(
+        key="shot_in_the_dark",
+        name="Shot in the Dark",
+        description="Frame it as unlikely but potentially helpful",
+        subject_templates=(
             "Bit of a long shot, but...",
             "Might be totally off base here",
             "Not sure if this even applies to {industry}",
-            "This might be irrelevant, but..."
-        ],
-        "opener_templates": [
+            "This might be irrelevant, but...",
+        ),
+        opener_templates=(
             "This might be a total miss, but I noticed {problem} and thought it was worth mentioning.",
             "Long shot here — but if {audience} is a priority, this could be useful.",
-            "Not sure if this applies to {client}, but I've seen this issue trip up a lot of {industry} teams."
-        ]
-    },
-    "clarity_gap": {
-        "name": "Clarity Gap",
-        "description": "Point to what's not obvious or missing",
-        "subject_templates": [
+            "Not sure if this applies to {client}, but I've seen this issue trip up a lot of {industry} teams.",
+        ),
+        frame_flip="The conventional approach in {industry} usually misses the nuance. What we've seen work is a lighter-touch model.",
+    ),
+    Hook(
+        key="clarity_gap",
+        name="Clarity Gap",
+        description="Point to what's not obvious or missing",
+        subject_templates=(
             "The part no one talks about",
             "What's actually breaking this",
             "The hidden blocker in {industry}",
-            "This usually gets missed"
-        ],
-        "opener_templates": [
+            "This usually gets missed",
+        ),
+        opener_templates=(
             "Most {audience} don't realize this is what's actually slowing things down.",
             "There's something most {industry} companies overlook when scaling — and it's not what you'd expect.",
-            "The surface-level fix rarely works. The real issue is usually deeper."
-        ]
-    },
-    "math_problem": {
-        "name": "Math Problem",
-        "description": "Show that it's a numbers issue",
-        "subject_templates": [
+            "The surface-level fix rarely works. The real issue is usually deeper.",
+        ),
+        frame_flip="Most people assume it's a {assumed_cause} issue. But the real blocker is usually upstream.",
+    ),
+    Hook(
+        key="math_problem",
+        name="Math Problem",
+        description="Show that it's a numbers issue",
+        subject_templates=(
             "The math doesn't add up",
             "When the numbers start lying",
             "This got awkward at $5M",
-            "ROAS looks good, but..."
-        ],
-        "opener_templates": [
+            "ROAS looks good, but...",
+        ),
+        opener_templates=(
             "The metrics look healthy on the surface — but the payback math tells a different story.",
             "Most {industry} companies hit a wall around $X because the unit economics quietly shift.",
-            "I've seen this pattern a lot: growth looks solid, but CAC is quietly eating margin."
-        ]
-    },
-    "overlooked_detail": {
-        "name": "Overlooked Detail",
-        "description": "Zoom in on a specific, overlooked blocker",
-        "subject_templates": [
+            "I've seen this pattern a lot: growth looks solid, but CAC is quietly eating margin.",
+        ),
+        frame_flip="On paper, the metrics look fine. But when you zoom into payback windows, the story changes.",
+    ),
+    Hook(
+        key="overlooked_detail",
+        name="Overlooked Detail",
+        description="Zoom in on a specific, overlooked blocker",
+        subject_templates=(
             "One small thing that's costing you",
             "The detail that's quietly breaking this",
             "Buried under 47 follow-ups",
-            "This tiny thing is killing conversions"
-        ],
-        "opener_templates": [
+            "This tiny thing is killing conversions",
+        ),
+        opener_templates=(
             "There's a small detail in how {client} handles {process} that's likely costing more than it looks.",
             "Zooming in on one specific thing: {specific_issue}. It's small, but it's a surprisingly common leak.",
-            "I noticed something in your {process} that most people overlook — but it's a high-leverage fix."
-        ]
-    },
-    "anti_pitch": {
-        "name": "Anti-Pitch",
-        "description": "Emphasize that it's not a sales push",
-        "subject_templates": [
+            "I noticed something in your {process} that most people overlook — but it's a high-leverage fix.",
+        ),
+        frame_flip="It's a small thing — but when we fixed this for similar {industry} companies, replies went up 3x.",
+    ),
+    Hook(
+        key="anti_pitch",
+        name="Anti-Pitch",
+        description="Emphasize that it's not a sales push",
+        subject_templates=(
             "Not a pitch — just a thought",
             "No agenda, just noticed this",
             "Happy to leave you alone after this",
-            "Quick observation (no ask)"
-        ],
-        "opener_templates": [
+            "Quick observation (no ask)",
+        ),
+        opener_templates=(
             "Not trying to sell you anything — just noticed something that might be useful.",
             "No pitch here. I saw {observation} and thought it was worth flagging.",
-            "This isn't a sales push. Just something I've seen work for other {industry} teams."
-        ]
-    },
-    "status_signaling": {
-        "name": "Status Signaling",
-        "description": "Mention big logos casually for authority",
-        "subject_templates": [
+            "This isn't a sales push. Just something I've seen work for other {industry} teams.",
+        ),
+        frame_flip="Just flagging something I've observed. No agenda here — just thought it might save you some headaches.",
+    ),
+    Hook(
+        key="status_signaling",
+        name="Status Signaling",
+        description="Mention big logos casually for authority",
+        subject_templates=(
             "What {big_company} figured out",
             "Borrowed this from {big_company}",
             "Seeing this across YC companies",
-            "Cozy Earth used this to hit $80M"
-        ],
-        "opener_templates": [
+            "Cozy Earth used this to hit $80M",
+        ),
+        opener_templates=(
             "We helped {big_company} solve a similar issue — might be relevant to {client}.",
             "Seeing a pattern across companies like {big_company} and {another_company} in {industry}.",
-            "This is something we stumbled on working with teams at {big_company}, {another_company}, etc."
-        ]
-    }
-}
+            "This is something we stumbled on working with teams at {big_company}, {another_company}, etc.",
+        ),
+        frame_flip="This is something we stumbled on working with teams at {big_company}. Might be worth exploring for {client}.",
+    ),
+)}
+
+# Shared lookups (never rebuilt per request)
+HOOK_KEYS = tuple(HOOK_TYPES)
+HOOK_KEYS_BY_NAME = {hook.name: key for key, hook in HOOK_TYPES.items()}
+HOOK_NAMES = tuple(HOOK_KEYS_BY_NAME)
+
+# Hooks whose copy asserts nothing about customers or results (no name-drops,
+# no outcome figures) - the only ones swapped into an LLM batch
+CLAIM_BEARING_HOOK_KEYS = ("overlooked_detail", "status_signaling")
+CLAIM_FREE_HOOK_KEYS = tuple(key for key in HOOK_KEYS if key not in CLAIM_BEARING_HOOK_KEYS)
+
+# Frame flip for hooks without their own
+DEFAULT_FRAME_FLIP = "There's a simpler fix than what most people try first."
+
+# Names dropped by the status-signaling hook
+BIG_COMPANIES = ("Cozy Earth", "YSL", "BMW", "Microsoft", "Shopify")
+ANOTHER_COMPANIES = BIG_COMPANIES[1:]
+
+# What prospects usually blame (clarity-gap frame flip)
+ASSUMED_CAUSES = ("content", "targeting", "timing")
 
 # CTA options (soft, curiosity-based)
-CTA_OPTIONS = [
+CTA_OPTIONS = tuple(map(sys.intern, (
     "Want me to send over a quick breakdown?",
     "Happy to share 3 quick fixes if useful.",
     "Open to a quick call to sketch out what this could look like?",
     "Want a peek at the deck?",
     "Should I send a few examples of what's worked?",
-    "Worth a 10-min chat to see if there's a fit?"
-]
+    "Worth a 10-min chat to see if there's a fit?",
+)))
 
 # P.S. templates (human, witty)
-PS_TEMPLATES = [
+PS_TEMPLATES = tuple(map(sys.intern, (
     "P.S. If this is totally off, feel free to ignore — I won't follow up 37 times.",
     "P.S. No hard feelings if this isn't the right time. Just thought it was worth a shot.",
     "P.S. We've seen this move the needle for {industry} teams, but happy to leave you alone if not.",
     "P.S. Worst case, you have a new contact who actually knows {industry}.",
-    "P.S. If you're buried under emails, I get it. Ping me whenever, or never."
-]
+    "P.S. If you're buried under emails, I get it. Ping me whenever, or never.",
+)))
+
+# Follow-up sequence: progressive steps, not repeats. Sent as in-thread replies.
+FOLLOW_UP_STEPS = {step.step: _interned(step) for step in (
+    FollowUpStep(
+        step=1,
+        name="Bump",
+        description="Just in case it got buried - a nudge plus the key benefit again",
+        templates=(
+            "Floating this back up in case it got buried.\n\nShort version: {benefit}.\n\n{cta}",
+            "Bumping this in case it slipped under the pile.\n\nThe gist: {benefit}.\n\n{cta}",
+        ),
+        ctas=("Worth a quick look?", "Still worth a peek?", "Curious if this resonates?"),
+    ),
+    FollowUpStep(
+        step=2,
+        name="Lighter CTA",
+        description="Drop the ask to a free resource / lead magnet",
+        templates=(
+            "No call needed. Put together a short list of what's working for {audience} in {industry}.\n\n{cta}",
+            "Lighter idea: I have a one-page breakdown on {problem}.\n\n{cta}",
+        ),
+        ctas=("Want me to send it over?", "Should I send it your way?", "Mind if I drop it here?"),
+    ),
+    FollowUpStep(
+        step=3,
+        name="Human Check-in",
+        description="Honest, low-pressure check-in that makes replying easy",
+        templates=(
+            "Last one from me.\n\n{cta}",
+            "I'll take the hint if it's a no.\n\n{cta}",
+        ),
+        ctas=(
+            "Should I leave this alone or was it at least 10% interesting?",
+            "Close the loop - wrong person, wrong time, or just not a fit?",
+        ),
+    ),
+)}
 
 def get_all_hook_types():
-    """Return all hook type keys."""
-    return list(HOOK_TYPES.keys())
+    """Return all hook type keys (a shared tuple)."""
+    return HOOK_KEYS
 
 def get_hook(hook_key):
     """Get a specific hook type by key."""
     return HOOK_TYPES.get(hook_key)
+
+def get_follow_up(step):
+    """Get a follow-up step definition by number (1-3)."""
+    return FOLLOW_UP_STEPS.get(step)
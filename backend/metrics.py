@@ -0,0 +1,292 @@
+"""
+Metrics - Lightweight latency and counter instrumentation.
+Stage timers feed histograms that are exposed at /api/metrics in Prometheus text format.
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows: exiting workers fold their numbers in unlocked
+    FCNTL_AVAILABLE = False
+
+# Latency buckets (seconds) - covers sub-ms parsing up to slow LLM calls
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Help text for every metric we emit
+METRIC_HELP = {
+    "copygen_stage_seconds": ("histogram", "Latency of each generation pipeline stage"),
+    "copygen_fallbacks_total": ("counter", "Template-mode fallbacks by reason"),
+    "copygen_cache_hits_total": ("counter", "Cache hits by cache name"),
+    "copygen_cache_misses_total": ("counter", "Cache misses by cache name"),
+    "copygen_cache_evictions_total": ("counter", "Entries evicted to stay under a cache's size cap, by cache name"),
+    "copygen_errors_total": ("counter", "Errors by pipeline stage"),
+    "copygen_duplicates_total": ("counter", "Near-duplicate variations replaced, by source"),
+    "copygen_requests_total": ("counter", "API requests by endpoint and status"),
+    "copygen_llm_calls_total": ("counter", "LLM provider calls by provider and status"),
+    "copygen_parse_rejected_total": ("counter", "Website parses skipped because the parse pool queue was full"),
+    "copygen_admission_total": ("counter", "Admission decisions (admitted, degraded, rejected, cancelled) by reason"),
+    "copygen_rule_violations_total": ("counter", "LLM variations breaking a prompt rule, by rule"),
+    "copygen_repairs_total": ("counter", "Rule-breaking variations by fix: local repair, rewrite or template"),
+    "copygen_context_refresh_total": ("counter", "Background website refreshes by status (updated, unchanged, error)"),
+    "copygen_batch_jobs_total": ("counter", "Deferred LLM batch jobs by status (submitted, succeeded, failed, submit_error)"),
+    "copygen_deadline_total": ("counter", "Stages abandoned because the request deadline ran out, by stage"),
+    "copygen_degraded_total": ("counter", "Degradations taken to stay inside the request deadline, by step"),
+    "copygen_outcomes_total": ("counter", "Ingested outcome events by type"),
+    "copygen_history_dropped_total": ("counter", "Generations not persisted because the write queue was full"),
+}
+
+# Per-worker snapshots are written here when running under gunicorn
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+FLUSH_INTERVAL = 1.0
+# Exited workers' final numbers, summed into one file so counters never go backwards
+EXITED_SNAPSHOT = "metrics_exited.json"
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """
+    Thread-safe in-process store of counters and histograms.
+    Keys are (metric_name, sorted_label_tuple).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._dirty = False
+        self._flusher_pid = None
+        self._retired_pid = None
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._maybe_flush()
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = {"buckets": [0] * len(STAGE_BUCKETS), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(STAGE_BUCKETS):
+                if value <= bound:
+                    hist["buckets"][i] += 1
+                    break
+            hist["sum"] += value
+            hist["count"] += 1
+        self._maybe_flush()
+
+    def snapshot(self):
+        """Return a JSON-serializable copy of the current values."""
+        with self._lock:
+            return {
+                "counters": [[name, list(map(list, labels)), value]
+                             for (name, labels), value in self._counters.items()],
+                "histograms": [[name, list(map(list, labels)), dict(h, buckets=list(h["buckets"]))]
+                               for (name, labels), h in self._histograms.items()],
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def flush(self):
+        """Write this worker's snapshot to the shared multiprocess directory."""
+        if not MULTIPROC_DIR or self._retired_pid == os.getpid():
+            return
+        self._dirty = False
+        try:
+            os.makedirs(MULTIPROC_DIR, exist_ok=True)
+            _write_snapshot(_snapshot_path(os.getpid()), self.snapshot())
+        except OSError:
+            pass
+
+    def retire(self):
+        """
+        On worker exit: fold this worker's final numbers into EXITED_SNAPSHOT
+        and delete its own file, so dead pids don't pile up in the directory
+        and the merged counters stay monotonic.
+        """
+        pid = os.getpid()
+        if not MULTIPROC_DIR or self._retired_pid == pid:
+            return
+        self._retired_pid = pid
+        exited = os.path.join(MULTIPROC_DIR, EXITED_SNAPSHOT)
+        try:
+            os.makedirs(MULTIPROC_DIR, exist_ok=True)
+            with open(exited + ".lock", "a") as lock:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                snapshots = [self.snapshot()]
+                try:
+                    with open(exited) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    pass
+                _write_snapshot(exited, _as_snapshot(*merge_snapshots(snapshots)))
+                try:
+                    os.remove(_snapshot_path(pid))
+                except FileNotFoundError:
+                    pass
+        except OSError:
+            pass
+
+    def _maybe_flush(self):
+        """Mark the snapshot stale and make sure this process has a flusher thread."""
+        if not MULTIPROC_DIR:
+            return
+        self._dirty = True
+        pid = os.getpid()
+        if self._flusher_pid != pid:
+            # First record in this process (threads don't survive fork)
+            with self._lock:
+                if self._flusher_pid == pid:
+                    return
+                self._flusher_pid = pid
+            threading.Thread(target=self._flush_loop, name="metrics-flush", daemon=True).start()
+
+    def _flush_loop(self):
+        """Write the snapshot every FLUSH_INTERVAL while there is something new, idle or not."""
+        pid = os.getpid()
+        while self._retired_pid != pid:
+            time.sleep(FLUSH_INTERVAL)
+            if self._dirty:
+                self.flush()
+
+
+def _snapshot_path(pid):
+    return os.path.join(MULTIPROC_DIR, f"metrics_{pid}.json")
+
+
+def _write_snapshot(path, snapshot):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def _as_snapshot(counters, histograms):
+    """merge_snapshots() output back in snapshot form."""
+    return {
+        "counters": [[name, list(map(list, labels)), value] for (name, labels), value in counters.items()],
+        "histograms": [[name, list(map(list, labels)), h] for (name, labels), h in histograms.items()],
+    }
+
+
+registry = Registry()
+# Worker exit normally goes through gunicorn's worker_exit hook; this covers other exits
+atexit.register(registry.retire)
+
+
+def inc(name, value=1, **labels):
+    """Increment a counter."""
+    registry.inc(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    """Record a histogram observation."""
+    registry.observe(name, value, **labels)
+
+
+@contextmanager
+def timer(stage):
+    """
+    Time a pipeline stage. Errors raised inside the block are counted
+    against the stage and re-raised.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.inc("copygen_errors_total", stage=stage)
+        raise
+    finally:
+        registry.observe("copygen_stage_seconds", time.perf_counter() - start, stage=stage)
+
+
+# ============ AGGREGATION & EXPOSITION ============
+
+def _collect_snapshots():
+    """Gather snapshots from every worker (or just this process)."""
+    if not MULTIPROC_DIR:
+        return [registry.snapshot()]
+
+    registry.flush()
+    snapshots = []
+    for path in glob.glob(os.path.join(MULTIPROC_DIR, "metrics_*.json")):
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def merge_snapshots(snapshots):
+    """Sum counters and histogram buckets across snapshots."""
+    counters = {}
+    histograms = {}
+    for snap in snapshots:
+        for name, labels, value in snap.get("counters", []):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snap.get("histograms", []):
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, {"buckets": [0] * len(STAGE_BUCKETS), "sum": 0.0, "count": 0})
+            for i, n in enumerate(hist["buckets"]):
+                merged["buckets"][i] += n
+            merged["sum"] += hist["sum"]
+            merged["count"] += hist["count"]
+    return counters, histograms
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    inner = ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + inner + "}"
+
+
+def render_prometheus():
+    """Render all metrics in the Prometheus text exposition format."""
+    counters, histograms = merge_snapshots(_collect_snapshots())
+    lines = []
+    seen = set()
+
+    def header(name):
+        if name in seen:
+            return
+        seen.add(name)
+        kind, help_text = METRIC_HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for (name, labels), hist in sorted(histograms.items()):
+        header(name)
+        cumulative = 0
+        for bound, n in zip(STAGE_BUCKETS, hist["buckets"]):
+            cumulative += n
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {hist['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {hist['sum']:.6f}")
+        lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,190 @@
+"""
+Parse Pool - Website HTML parsing in a persistent process pool.
+BeautifulSoup parsing is CPU-bound and holds the GIL; running it in separate
+processes keeps request threads that are waiting on LLM I/O responsive. Only
+the raw page bytes go in and the compact context dict comes back.
+"""
+
+import contextvars
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import TimeoutError as FutureTimeout
+from contextlib import contextmanager
+
+from metrics import inc, observe
+from structured_logging import get_logger
+
+log = get_logger("parse_pool")
+
+# 0 parses inline on the calling thread (no pool)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Jobs queued or running before new ones are rejected
+PARSE_MAX_PENDING = int(os.getenv("PARSE_MAX_PENDING", str(max(1, PARSE_WORKERS) * 8)))
+PARSE_TIMEOUT = float(os.getenv("PARSE_TIMEOUT", "10"))
+
+_inline = contextvars.ContextVar("parse_inline", default=False)
+
+
+class ParsePoolFull(RuntimeError):
+    """Raised when PARSE_MAX_PENDING jobs are already queued or running."""
+
+
+@contextmanager
+def parse_inline():
+    """Parse on the calling thread inside this block (e.g. so the profiler sees it)."""
+    token = _inline.set(True)
+    try:
+        yield
+    finally:
+        _inline.reset(token)
+
+
+def _warm():
+    """Worker initializer: import bs4 and exercise the parser once."""
+    from website_analyzer import extract_context
+    extract_context(b"<html><head><title>warm</title></head><body><h1>warm up</h1></body></html>")
+
+
+def _ping():
+    return os.getpid()
+
+
+def _parse_job(html, encoding):
+    from website_analyzer import extract_context
+    timings = {}
+    context = extract_context(html, encoding, timings)
+    return context, timings
+
+
+class ParsePool:
+    """
+    Bounded submit/await front end for a ProcessPoolExecutor.
+    Workers are spawned (not forked) so they never inherit request-thread locks.
+    """
+
+    def __init__(self, workers=PARSE_WORKERS, max_pending=PARSE_MAX_PENDING):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm,
+        )
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def warm(self):
+        """Start every worker now instead of on the first requests."""
+        for future in [self._executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, html, encoding=None):
+        """Queue a page for parsing; returns a Future of (context, timings)."""
+        if not self._slots.acquire(blocking=False):
+            inc("copygen_parse_rejected_total")
+            raise ParsePoolFull(f"{self.max_pending} parse jobs already pending")
+        with self._lock:
+            self._pending += 1
+        try:
+            future = self._executor.submit(_parse_job, html, encoding)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def parse(self, html, encoding=None, timeout=PARSE_TIMEOUT):
+        """Parse in the pool and wait for the context dict."""
+        queued = time.perf_counter()
+        future = self.submit(html, encoding)
+        try:
+            context, timings = future.result(timeout=timeout)
+        except FutureTimeout:
+            inc("copygen_errors_total", stage="parse_timeout")
+            raise TimeoutError(f"parse took longer than {timeout}s")
+        for stage, seconds in timings.items():
+            observe("copygen_stage_seconds", seconds, stage=stage)
+        observe("copygen_stage_seconds", time.perf_counter() - queued - sum(timings.values()),
+                stage="parse_queue")
+        return context
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_parse_pool():
+    """
+    This process's pool, created on first use (None when PARSE_WORKERS=0).
+    A pool inherited across fork (gunicorn preload) is replaced, not reused.
+    """
+    global _pool, _pool_pid
+    if PARSE_WORKERS <= 0:
+        return None
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = ParsePool()
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def _discard_broken_pool(pool):
+    """Drop a pool whose worker died, so the next get_parse_pool() starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown()
+    inc("copygen_errors_total", stage="parse_pool_broken")
+    log.warning("parse pool broken, replacing it")
+
+
+def shutdown_parse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.shutdown()
+        _pool = None
+
+
+def parse_page(html, encoding=None, timeout=PARSE_TIMEOUT):
+    """
+    Extract the context dict from raw page bytes - in the pool (waiting at
+    most `timeout`), or inline when the pool is disabled or inside parse_inline().
+    A pool broken by a dead worker is replaced and the page retried once in
+    the new one; if that breaks too, the page is parsed inline.
+    """
+    pool = None if _inline.get() else get_parse_pool()
+    for _ in range(2):
+        if pool is None:
+            break
+        try:
+            return pool.parse(html, encoding, timeout)
+        except BrokenProcessPool:
+            _discard_broken_pool(pool)
+            pool = get_parse_pool()
+    from website_analyzer import extract_context
+    timings = {}
+    context = extract_context(html, encoding, timings)
+    for stage, seconds in timings.items():
+        observe("copygen_stage_seconds", seconds, stage=stage)
+    return context
@@ -0,0 +1,155 @@
+"""
+Prefetch - Speculative website analysis started from the wizard.
+The website step posts to /api/prefetch as soon as the URL is entered; the
+scrape runs in the background while the user writes strategy notes, and
+generation picks up the finished context (or joins the fetch still in flight).
+Entries are keyed on (URL, session) and expire after a few minutes. The cache
+is per process, so under several gunicorn workers a prefetch only helps when
+both requests land on the same worker; a miss just scrapes as before.
+Fetches queued or running are capped overall (PREFETCH_MAX_PENDING) and per
+API key (ADMISSION_KEY_LIMIT, as for /api/generate); past either the
+request is refused with 429 rather than queued.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from admission import KEY_LIMIT, Rejected
+from metrics import inc
+from structured_logging import get_logger
+from website_analyzer import analyze_website
+
+log = get_logger("prefetch")
+
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", "300"))
+PREFETCH_MAX_ENTRIES = int(os.getenv("PREFETCH_MAX_ENTRIES", "256"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+# Fetches queued or running before new prefetches are refused
+PREFETCH_MAX_PENDING = int(os.getenv("PREFETCH_MAX_PENDING", str(PREFETCH_WORKERS * 4)))
+# Retry-After on a refused prefetch (about one fetch)
+PREFETCH_RETRY_AFTER = 2
+# Longest generation will wait on a fetch still in flight (fetch + parse timeouts)
+PREFETCH_JOIN_TIMEOUT = float(os.getenv("PREFETCH_JOIN_TIMEOUT", "20"))
+
+
+class PrefetchCache:
+    """(url, session) -> Future of the analyze_website() context, with a TTL."""
+
+    def __init__(self, ttl=PREFETCH_TTL, max_entries=PREFETCH_MAX_ENTRIES, workers=PREFETCH_WORKERS,
+                 max_pending=PREFETCH_MAX_PENDING, key_limit=KEY_LIMIT, analyze=analyze_website,
+                 clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_pending = max_pending
+        self.key_limit = key_limit
+        self.analyze = analyze
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._pending = 0
+        self._per_key = {}
+        # Reentrant: cancelling an entry under the lock runs its _finished callback inline
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+
+    def _live(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created, future = entry
+        if now - created > self.ttl:
+            del self._entries[key]
+            future.cancel()
+            return None
+        return future
+
+    def start(self, url, session, api_key="anonymous"):
+        """
+        Begin analyzing `url` for `session` unless already cached; returns the
+        entry's status. Raises Rejected (429) when too many fetches are pending
+        overall or for `api_key`.
+        """
+        key = (url.strip(), session)
+        now = self.clock()
+        with self._lock:
+            future = self._live(key, now)
+            if future is not None:
+                return "ready" if future.done() else "pending"
+            if self._pending >= self.max_pending:
+                raise self._refuse("prefetch_busy")
+            if self.key_limit and self._per_key.get(api_key, 0) >= self.key_limit:
+                raise self._refuse("key_quota")
+            while len(self._entries) >= self.max_entries:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                # Only stops it if it hasn't started; a running fetch finishes and is dropped
+                evicted.cancel()
+            self._pending += 1
+            self._per_key[api_key] = self._per_key.get(api_key, 0) + 1
+            future = self._executor.submit(contextvars.copy_context().run, self.analyze, key[0])
+            self._entries[key] = (now, future)
+        # Outside the lock: the callback runs right away if the fetch already finished
+        future.add_done_callback(partial(self._finished, api_key))
+        log.info("prefetch started", extra={"fields": {"url": key[0]}})
+        return "started"
+
+    def _refuse(self, reason):
+        log.warning("prefetch refused", extra={"fields": {"reason": reason, "pending": self._pending}})
+        return Rejected(429, reason, PREFETCH_RETRY_AFTER)
+
+    def _finished(self, api_key, _future):
+        with self._lock:
+            self._pending -= 1
+            remaining = self._per_key.get(api_key, 0) - 1
+            if remaining > 0:
+                self._per_key[api_key] = remaining
+            else:
+                self._per_key.pop(api_key, None)
+
+    def get(self, url, session, timeout=PREFETCH_JOIN_TIMEOUT):
+        """
+        The prefetched context for (url, session), waiting up to `timeout` for
+        a fetch still running. None on a miss, expiry, timeout or failure.
+        """
+        if not url or not session:
+            return None
+        with self._lock:
+            future = self._live((url.strip(), session), self.clock())
+        if future is None:
+            inc("copygen_cache_misses_total", cache="prefetch")
+            return None
+        try:
+            context = future.result(timeout=timeout)
+        except FutureTimeout:
+            inc("copygen_cache_misses_total", cache="prefetch")
+            log.warning("prefetch still running, scraping again", extra={"fields": {"url": url}})
+            return None
+        except Exception as e:
+            inc("copygen_cache_misses_total", cache="prefetch")
+            log.warning("prefetch failed", extra={"fields": {"url": url, "error": str(e)}})
+            return None
+        inc("copygen_cache_hits_total", cache="prefetch")
+        return context
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+
+def get_prefetch_cache():
+    """This process's prefetch cache (a cache inherited across fork is replaced)."""
+    global _cache, _cache_pid
+    if _cache is None or _cache_pid != os.getpid():
+        with _cache_lock:
+            if _cache is None or _cache_pid != os.getpid():
+                _cache = PrefetchCache()
+                _cache_pid = os.getpid()
+    return _cache
@@ -0,0 +1,157 @@
+"""
+Profiling - Opt-in per-request profiling for slow generations.
+Runs a call under a stack sampler, cProfile and tracemalloc, and stores the result
+on disk. Samples are kept as collapsed stacks, ready for flamegraph.pl / speedscope.
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "copygen-profiles"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.001"))
+
+_PROFILE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# tracemalloc is process-wide, so only one profiled request runs at a time
+_profile_lock = threading.Lock()
+
+
+class ProfileBusy(Exception):
+    """Raised when another request is already being profiled."""
+
+
+def is_authorized(token):
+    """Profiling is disabled unless ADMIN_TOKEN is set; compare in constant time."""
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+class StackSampler(threading.Thread):
+    """Periodically samples one thread's Python stack into collapsed-stack counts."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def collapsed(self):
+        """Brendan Gregg's collapsed format: `frame;frame;frame count` per line."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+
+def _pstats_text(profiler, limit=40):
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def _memory_summary(before, after, peak, limit=15):
+    top = []
+    for stat in after.compare_to(before, "lineno")[:limit]:
+        frame = stat.traceback[0]
+        top.append({
+            "where": f"{os.path.basename(frame.filename)}:{frame.lineno}",
+            "size_kb": round(stat.size_diff / 1024, 1),
+            "count": stat.count_diff,
+        })
+    return {"peak_kb": round(peak / 1024, 1), "top": top}
+
+
+def profile_call(fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) under the profilers.
+
+    Returns:
+        (result, profile) where profile is a JSON-serializable dict
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfileBusy("another request is already being profiled")
+
+    try:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+
+        sampler = StackSampler(threading.get_ident())
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        sampler.start()
+        profiler.enable()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            sampler.stop()
+            wall = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+
+        profile = {
+            "id": uuid.uuid4().hex,
+            "created": time.time(),
+            "wall_ms": round(wall * 1000, 1),
+            "samples": sum(sampler.samples.values()),
+            "collapsed": sampler.collapsed(),
+            "pstats": _pstats_text(profiler),
+            "memory": _memory_summary(before, after, peak),
+        }
+        return result, profile
+    finally:
+        _profile_lock.release()
+
+
+# ============ STORAGE ============
+
+def save_profile(profile):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{profile['id']}.json")
+    with open(path, "w") as f:
+        json.dump(profile, f)
+    return path
+
+
+def load_profile(profile_id):
+    """Load a stored profile, or None if the ID is malformed or unknown."""
+    if not _PROFILE_ID_RE.match(profile_id or ""):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.json")
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
@@ -0,0 +1,394 @@
+"""
+Providers - Interchangeable LLM backends behind a latency-aware router.
+Gemini, any OpenAI-compatible endpoint (vLLM, llama.cpp, Ollama, LM Studio...)
+and a deterministic fake all expose complete(prompt); the Router tracks rolling
+latency and error rate per provider/model and sends each call to the fastest
+healthy backend in the requested tier.
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+
+from metrics import inc
+from structured_logging import get_logger
+
+log = get_logger("providers")
+
+try:
+    from google import genai
+    from google.genai import types
+    GENAI_AVAILABLE = True
+except ImportError:
+    GENAI_AVAILABLE = False
+
+# Tiers: "flash" for everyday drafts, "pro" only when explicitly requested
+TIERS = ("flash", "pro")
+DEFAULT_TIER = "flash"
+
+# Router tuning
+EWMA_ALPHA = 0.2
+FAILURES_TO_OPEN = 3
+COOLDOWN_SECONDS = 30.0
+MAX_COOLDOWN_SECONDS = 300.0
+EXPLORE_RATE = float(os.getenv("LLM_EXPLORE_RATE", "0.05"))
+
+
+class EmptyResponse(RuntimeError):
+    """
+    The model answered but with no text (safety block, empty candidate,
+    output token limit) - a content problem, not the provider's health.
+    """
+
+
+def _within(timeout, call):
+    """
+    Return call() if it finishes within `timeout` seconds in total, else raise
+    TimeoutError. HTTP client timeouts bound each connect/read phase, not the
+    whole call, so a slow trickle of bytes could run well past the deadline;
+    the call runs in its own thread and an abandoned one ends in the
+    background at its client timeout.
+    """
+    if timeout is None:
+        return call()
+    outcome = {}
+
+    def run():
+        try:
+            outcome["text"] = call()
+        except BaseException as e:
+            outcome["error"] = e
+
+    context = contextvars.copy_context()
+    thread = threading.Thread(target=context.run, args=(run,), name="llm-call", daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise TimeoutError(f"no complete response within {timeout:.2f}s")
+    if "error" in outcome:
+        raise outcome["error"]
+    return outcome["text"]
+
+
+# ============ PROVIDERS ============
+
+class Provider:
+    """A single model on a single backend."""
+
+    kind = "base"
+
+    def __init__(self, model_id, tier=DEFAULT_TIER, name=None):
+        self.model_id = model_id
+        self.tier = tier
+        self.name = name or f"{self.kind}:{model_id}"
+
+    def complete(self, prompt, temperature=0.5, max_output_tokens=4000, seed=None, schema=None, timeout=None):
+        """
+        Return the model's raw text for `prompt` (`seed`: best-effort reproducible
+        sampling; `schema`: JSON Schema the output must follow, where supported;
+        `timeout`: total seconds to give up after, from the request's deadline).
+        """
+        raise NotImplementedError
+
+
+class GeminiProvider(Provider):
+    kind = "gemini"
+
+    def __init__(self, model_id, tier=DEFAULT_TIER, api_key=None, name=None):
+        super().__init__(model_id, tier, name)
+        if not GENAI_AVAILABLE:
+            raise ValueError("google-genai is not installed")
+        self.client = genai.Client(api_key=api_key)
+
+    def complete(self, prompt, temperature=0.5, max_output_tokens=4000, seed=None, schema=None, timeout=None):
+        structured = {"response_mime_type": "application/json", "response_schema": schema} if schema else {}
+        if timeout is not None:
+            structured["http_options"] = types.HttpOptions(timeout=max(1, int(timeout * 1000)))
+        config = types.GenerateContentConfig(
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            seed=seed,
+            **structured
+        )
+        response = _within(timeout, lambda: self.client.models.generate_content(
+            model=self.model_id, contents=prompt, config=config))
+        text = (response.text or "").strip()
+        if not text:
+            candidates = response.candidates or []
+            reason = getattr(candidates[0], "finish_reason", None) if candidates else None
+            raise EmptyResponse(f"{self.name} returned no text (finish reason: {reason or 'no candidates'})")
+        return text
+
+
+class OpenAICompatibleProvider(Provider):
+    """Any server implementing POST {base_url}/chat/completions."""
+
+    kind = "openai"
+
+    def __init__(self, base_url, model_id, tier=DEFAULT_TIER, api_key=None, timeout=120, name=None):
+        super().__init__(model_id, tier, name)
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.timeout = timeout
+        self._local = threading.local()
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _post(self, payload, timeout, session=None):
+        response = (session or self._session()).post(self.url, headers=self.headers, timeout=timeout, json=payload)
+        response.raise_for_status()
+        return response.json()["choices"][0]
+
+    def complete(self, prompt, temperature=0.5, max_output_tokens=4000, seed=None, schema=None, timeout=None):
+        payload = {
+            "model": self.model_id,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "max_tokens": max_output_tokens,
+        }
+        if seed is not None:
+            payload["seed"] = seed
+        if schema:
+            payload["response_format"] = {"type": "json_schema", "json_schema": {"name": "output", "schema": schema}}
+        if timeout is None:
+            choice = self._post(payload, self.timeout)
+        else:
+            # The call thread is new, so lend it this thread's pooled session
+            session = self._session()
+            choice = _within(timeout, lambda: self._post(payload, min(self.timeout, timeout), session))
+        text = (choice["message"].get("content") or "").strip()
+        if not text:
+            raise EmptyResponse(f"{self.name} returned no text (finish reason: {choice.get('finish_reason')})")
+        return text
+
+
+class FakeProvider(Provider):
+    """
+    Deterministic offline model: the same prompt always yields the same
+    well-formed JSON. Optional fixed latency for routing experiments.
+    """
+
+    kind = "fake"
+    HOOKS = ("Unexpected Insight", "Specificity Play", "Casual Value Drop", "Pattern Break")
+
+    def __init__(self, model_id="fake-flash", tier=DEFAULT_TIER, latency_ms=0.0, name=None):
+        super().__init__(model_id, tier, name)
+        self.latency_ms = latency_ms
+
+    def complete(self, prompt, temperature=0.5, max_output_tokens=4000, seed=None, schema=None, timeout=None):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000.0)
+        digest = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(digest if seed is None else digest ^ seed)
+        if "## WRITE FOLLOW-UP" in prompt:
+            return json.dumps({"followUps": [
+                {"id": i, "body": "{{first_name}} – circling back in case this got buried.\n\n"
+                                  f"Still think the #{rng.randint(1, 9)} fix applies.\n\nWorth a quick look?"}
+                for i in range(1, 5)
+            ]})
+        variations = [
+            {"subject": f"{hook.lower()} #{rng.randint(10, 99)}",
+             "body": f"Most teams miss step {rng.randint(2, 7)} of the handoff.\n\n"
+                     "It's where replies leak.\n\nCurious if this resonates?",
+             "ps": "P.S. No pressure either way - just thought it might click."}
+            for hook in self.HOOKS
+        ]
+        if schema:
+            return json.dumps({"v": [{"s": v["subject"], "b": v["body"], "p": v["ps"]} for v in variations]})
+        return json.dumps({"variations": [
+            dict(v, id=i, hookType=hook, body="{{first_name}} – " + v["body"])
+            for i, (hook, v) in enumerate(zip(self.HOOKS, variations), start=1)
+        ]})
+
+
+# ============ ROUTING ============
+
+class ProviderStats:
+    """
+    Rolling health of one provider: EWMA latency of successful calls, EWMA
+    error rate, and a circuit that opens after consecutive failures.
+    """
+
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def record(self, elapsed, ok, now):
+        self.calls += 1
+        self.error_rate += EWMA_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.consecutive_failures = 0
+            self.latency = elapsed if self.latency is None else self.latency + EWMA_ALPHA * (elapsed - self.latency)
+            return
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= FAILURES_TO_OPEN:
+            # Back off exponentially while it keeps failing its probe calls
+            doublings = min(self.consecutive_failures - FAILURES_TO_OPEN, 4)
+            self.open_until = now + min(COOLDOWN_SECONDS * 2 ** doublings, MAX_COOLDOWN_SECONDS)
+
+    def healthy(self, now):
+        return now >= self.open_until
+
+    def expected_latency(self):
+        """Latency to a successful answer, counting retries (untried = 0, so it gets probed)."""
+        if self.latency is None:
+            return 0.0
+        return self.latency / max(1.0 - self.error_rate, 0.05)
+
+    def to_dict(self, now):
+        return {
+            "latencyMs": round(self.latency * 1000, 1) if self.latency is not None else None,
+            "errorRate": round(self.error_rate, 3),
+            "calls": self.calls,
+            "healthy": self.healthy(now),
+        }
+
+
+class Router:
+    """Sends each completion to the fastest healthy provider in a tier, failing over in order."""
+
+    def __init__(self, providers, explore_rate=EXPLORE_RATE, clock=time.monotonic, rng=None):
+        self.providers = list(providers)
+        self.explore_rate = explore_rate
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._stats = {p.name: ProviderStats() for p in self.providers}
+
+    def tiers(self):
+        return sorted({p.tier for p in self.providers})
+
+    def candidates(self, tier=DEFAULT_TIER):
+        """
+        Providers to try, in order: healthy ones by expected latency (with an
+        occasional random pick so slower backends keep fresh numbers), then
+        tripped ones as a last resort. Unknown tiers fall back to the default.
+        """
+        pool = [p for p in self.providers if p.tier == tier]
+        if not pool:
+            pool = [p for p in self.providers if p.tier == DEFAULT_TIER] or self.providers
+        now = self.clock()
+        with self._lock:
+            healthy = sorted((p for p in pool if self._stats[p.name].healthy(now)),
+                             key=lambda p: self._stats[p.name].expected_latency())
+            tripped = sorted((p for p in pool if not self._stats[p.name].healthy(now)),
+                             key=lambda p: self._stats[p.name].open_until)
+            if len(healthy) > 1 and self.rng.random() < self.explore_rate:
+                healthy.insert(0, healthy.pop(self.rng.randrange(1, len(healthy))))
+        return healthy + tripped
+
+    def record(self, provider, elapsed, ok):
+        with self._lock:
+            self._stats[provider.name].record(elapsed, ok, self.clock())
+        inc("copygen_llm_calls_total", provider=provider.name, status="ok" if ok else "error")
+
+    def complete(self, prompt, tier=DEFAULT_TIER, deadline=None, **options):
+        """
+        Return (text, provider) from the first provider that answers. With a
+        `deadline`, each attempt gets the time left as its timeout and no
+        failover starts once it has run out. A call cut off by that timeout,
+        or answered with no text (EmptyResponse), isn't held against the
+        provider's health; the next provider still gets a try.
+        """
+        last_error = None
+        for provider in self.candidates(tier):
+            if deadline is not None:
+                deadline.check("llm_call")
+                options["timeout"] = deadline.budget()
+            start = time.perf_counter()
+            try:
+                text = provider.complete(prompt, **options)
+            except EmptyResponse as e:
+                inc("copygen_llm_calls_total", provider=provider.name, status="empty")
+                log.warning("provider returned no text", extra={"fields": {"provider": provider.name, "error": str(e)}})
+                last_error = e
+                continue
+            except Exception as e:
+                if deadline is not None and time.perf_counter() - start >= options["timeout"]:
+                    # The caller's budget ran out, not the provider
+                    inc("copygen_llm_calls_total", provider=provider.name, status="deadline")
+                    deadline.check("llm_call")
+                else:
+                    self.record(provider, time.perf_counter() - start, ok=False)
+                log.warning("provider call failed", extra={"fields": {"provider": provider.name, "error": str(e)}})
+                last_error = e
+                continue
+            self.record(provider, time.perf_counter() - start, ok=True)
+            return text, provider
+        if last_error is None:
+            raise RuntimeError("No LLM providers configured")
+        raise last_error
+
+    def snapshot(self):
+        now = self.clock()
+        with self._lock:
+            return [dict(self._stats[p.name].to_dict(now), name=p.name, model=p.model_id, tier=p.tier)
+                    for p in self.providers]
+
+
+# ============ CONFIGURATION ============
+
+def providers_from_env():
+    """
+    Build providers from the environment:
+      GEMINI_API_KEY           -> GEMINI_FLASH_MODEL (flash) + GEMINI_PRO_MODEL (pro)
+      OPENAI_COMPAT_BASE_URL   -> OPENAI_COMPAT_MODEL in OPENAI_COMPAT_TIER
+      LLM_FAKE=1               -> deterministic fake in the flash tier
+    """
+    providers = []
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if api_key and api_key != "your_api_key_here" and GENAI_AVAILABLE:
+        providers.append(GeminiProvider(os.getenv("GEMINI_FLASH_MODEL", "gemini-2.5-flash"), "flash", api_key))
+        pro_model = os.getenv("GEMINI_PRO_MODEL", "gemini-2.5-pro")
+        if pro_model:
+            providers.append(GeminiProvider(pro_model, "pro", api_key))
+
+    base_url = os.getenv("OPENAI_COMPAT_BASE_URL")
+    if base_url:
+        providers.append(OpenAICompatibleProvider(
+            base_url,
+            os.getenv("OPENAI_COMPAT_MODEL", "local"),
+            os.getenv("OPENAI_COMPAT_TIER", DEFAULT_TIER),
+            api_key=os.getenv("OPENAI_COMPAT_API_KEY"),
+        ))
+
+    if os.getenv("LLM_FAKE") == "1":
+        providers.append(FakeProvider())
+
+    return providers
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Process-wide router over the providers configured in the environment."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = Router(providers_from_env())
+    return _router
+
+
+def set_router(router):
+    """Replace the process-wide router (None rebuilds it from the environment)."""
+    global _router
+    _router = router
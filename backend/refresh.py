@@ -0,0 +1,205 @@
+"""
+Refresh - Re-crawls configured client websites in the background so the
+context cache (context_cache.py) is warm before anyone asks for them.
+
+Each URL is refetched every CONTEXT_REFRESH_INTERVAL seconds, +/- a random
+CONTEXT_REFRESH_JITTER fraction so a batch of clients doesn't fetch in lock
+step, and never sooner than CONTEXT_REFRESH_HOST_DELAY seconds after the
+previous fetch from the same host. An unchanged page (same content hash)
+only renews its cache entry. Keep the interval under CONTEXT_CACHE_TTL.
+
+Under gunicorn every worker starts a scheduler but only the one holding the
+CONTEXT_REFRESH_LOCK file lock crawls; the others stand by and take over if
+it exits. `python -m copy_generator refresh` runs the same loop standalone.
+"""
+
+import heapq
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from context_cache import get_context_cache
+from history_store import HISTORY_DB_PATH
+from metrics import inc
+from structured_logging import get_logger
+from website_analyzer import fetch_context
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+log = get_logger("refresh")
+
+# Comma-separated URLs, and/or a file with one URL per line (# comments allowed)
+CONTEXT_REFRESH_URLS = os.getenv("CONTEXT_REFRESH_URLS", "")
+CONTEXT_REFRESH_FILE = os.getenv("CONTEXT_REFRESH_FILE", "")
+CONTEXT_REFRESH_INTERVAL = float(os.getenv("CONTEXT_REFRESH_INTERVAL", "3600"))
+CONTEXT_REFRESH_JITTER = float(os.getenv("CONTEXT_REFRESH_JITTER", "0.1"))
+CONTEXT_REFRESH_HOST_DELAY = float(os.getenv("CONTEXT_REFRESH_HOST_DELAY", "5"))
+CONTEXT_REFRESH_LOCK = os.getenv("CONTEXT_REFRESH_LOCK",
+                                 os.path.join(os.path.dirname(HISTORY_DB_PATH), "context-refresh.lock"))
+# How often a standby worker retries the lock
+LEADER_RETRY = 30.0
+
+
+def load_urls(urls=CONTEXT_REFRESH_URLS, path=CONTEXT_REFRESH_FILE):
+    """Configured URLs, deduplicated in order."""
+    found = [u.strip() for u in urls.split(",")]
+    if path:
+        with open(path, encoding="utf-8") as f:
+            found += [line.split("#", 1)[0].strip() for line in f]
+    return list(dict.fromkeys(u for u in found if u))
+
+
+class LeaderLock:
+    """Non-blocking exclusive flock; released by the OS if the holder dies."""
+
+    def __init__(self, path=CONTEXT_REFRESH_LOCK):
+        self.path = path
+        self._fd = None
+
+    def acquire(self):
+        if self._fd is not None:
+            return True
+        if not FCNTL_AVAILABLE:
+            # No flock (Windows): assume a single process
+            self._fd = -1
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None and self._fd >= 0:
+            os.close(self._fd)
+        self._fd = None
+
+
+class RefreshScheduler:
+    """
+    Min-heap of (due time, url). A URL whose host was fetched less than
+    `host_delay` ago is pushed back to when the host frees up, so other
+    hosts go first.
+    """
+
+    def __init__(self, urls, interval=CONTEXT_REFRESH_INTERVAL, jitter=CONTEXT_REFRESH_JITTER,
+                 host_delay=CONTEXT_REFRESH_HOST_DELAY, cache=None, clock=time.monotonic, rng=None):
+        self.urls = list(urls)
+        self.interval = interval
+        self.jitter = jitter
+        self.host_delay = host_delay
+        self.cache = cache if cache is not None else get_context_cache()
+        self.clock = clock
+        self.rng = rng or random.Random()
+        self._host_free = {}
+        # First pass spread over the first jitter window so a restart doesn't burst
+        now = clock()
+        self._due = [(now + self.rng.uniform(0, interval * jitter), url) for url in self.urls]
+        heapq.heapify(self._due)
+
+    def _next_interval(self):
+        return self.interval * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def next_url(self):
+        """(url, seconds until it may be fetched), honouring per-host delays."""
+        while True:
+            due, url = self._due[0]
+            free = self._host_free.get(urlsplit(url).netloc, 0.0)
+            if free <= due:
+                return url, max(0.0, due - self.clock())
+            heapq.heapreplace(self._due, (free, url))
+
+    def refresh(self, url):
+        """Fetch one URL now; returns "updated", "unchanged" or "error"."""
+        self._host_free[urlsplit(url).netloc] = self.clock() + self.host_delay
+        try:
+            _, changed = fetch_context(url, self.cache)
+            status = "updated" if changed else "unchanged"
+        except Exception as e:
+            status = "error"
+            log.warning("context refresh failed", extra={"fields": {"url": url, "error": str(e)}})
+        inc("copygen_context_refresh_total", status=status)
+        log.info("context refreshed", extra={"fields": {"url": url, "status": status}})
+        return status
+
+    def run(self, stop):
+        """Refresh URLs as they come due until `stop` (a threading.Event) is set."""
+        while self._due and not stop.is_set():
+            url, wait = self.next_url()
+            if wait > 0:
+                stop.wait(wait)
+                continue
+            self.refresh(url)
+            heapq.heapreplace(self._due, (self.clock() + self._next_interval(), url))
+
+    def run_once(self, stop=None):
+        """Refresh every URL once, host delays included; returns {url: status}."""
+        stop = stop or threading.Event()
+        results = {}
+        pending = set(self.urls)
+        while pending and not stop.is_set():
+            url, wait = self.next_url()
+            if wait > 0:
+                stop.wait(wait)
+                continue
+            results[url] = self.refresh(url)
+            pending.discard(url)
+            heapq.heappop(self._due)
+        return results
+
+
+# ============ BACKGROUND THREAD ============
+
+_thread = None
+_stop = threading.Event()
+
+
+def _lead_and_run(scheduler, lock):
+    while not _stop.is_set():
+        if lock.acquire():
+            log.info("context refresh started", extra={"fields": {"urls": len(scheduler.urls), "pid": os.getpid()}})
+            try:
+                scheduler.run(_stop)
+            finally:
+                lock.release()
+            return
+        _stop.wait(LEADER_RETRY)
+
+
+def start_background_refresh():
+    """
+    Start this process's refresh thread if any URLs are configured (and the
+    context cache is on). Call after fork - an inherited flock would be
+    shared with the parent.
+    """
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return _thread
+    cache = get_context_cache()
+    urls = load_urls()
+    if cache is None or not urls:
+        return None
+    _stop.clear()
+    scheduler = RefreshScheduler(urls, cache=cache)
+    _thread = threading.Thread(target=_lead_and_run, args=(scheduler, LeaderLock()),
+                               name="context-refresh", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def stop_background_refresh(timeout=5.0):
+    global _thread
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout)
+    _thread = None
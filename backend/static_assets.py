@@ -0,0 +1,157 @@
+"""
+Static Assets - Precompressed, content-hashed frontend files served from memory.
+The manifest is built once at startup; requests never touch the filesystem.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Only these files are ever served (keeps .py/.env/.json/.txt in the same folder private)
+ASSET_EXTENSIONS = {".html", ".css", ".js", ".svg", ".ico", ".png", ".webp", ".woff2"}
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".svg"}
+MIN_COMPRESS_SIZE = 512
+
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "no-cache"
+
+# Same-directory references in the entry page, e.g. href="style.css"
+_LOCAL_REF_RE = re.compile(r'(href|src)="([A-Za-z0-9_.-]+)"')
+# One entity tag in an If-None-Match list: *, "opaque" or W/"opaque"
+_ENTITY_TAG_RE = re.compile(r'\*|(?:W/)?"[^"]*"')
+
+
+class Asset:
+    """One servable file with its precompressed variants."""
+
+    __slots__ = ("body", "gzip", "br", "etag", "content_type", "cache_control")
+
+    def __init__(self, body, content_type, cache_control, compress):
+        self.body = body
+        self.content_type = content_type
+        self.cache_control = cache_control
+        # Weak ETag: the same validator covers every encoding of the content
+        self.etag = 'W/"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        self.gzip = None
+        self.br = None
+        if compress and len(body) >= MIN_COMPRESS_SIZE:
+            self.gzip = gzip.compress(body, compresslevel=9)
+            if BROTLI_AVAILABLE:
+                self.br = brotli.compress(body, quality=11)
+
+    def with_cache_control(self, cache_control):
+        clone = Asset.__new__(Asset)
+        for slot in Asset.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        clone.cache_control = cache_control
+        return clone
+
+
+class AssetManifest:
+    """
+    Maps request paths to in-memory assets.
+
+    Every asset is reachable under a content-hashed name (style.3f9a1c2b7e.css,
+    cached forever) and under its plain name (revalidated). The entry page is
+    rewritten to reference the hashed names and is always revalidated.
+    """
+
+    def __init__(self, root, entry="index.html"):
+        self.entry = entry
+        self.routes = {}
+        self.hashed_names = {}
+        self._build(root)
+
+    def _build(self, root):
+        names = sorted(
+            name for name in os.listdir(root)
+            if os.path.splitext(name)[1].lower() in ASSET_EXTENSIONS
+            and os.path.isfile(os.path.join(root, name))
+        )
+
+        for name in names:
+            if name == self.entry:
+                continue
+            with open(os.path.join(root, name), "rb") as f:
+                body = f.read()
+            stem, ext = os.path.splitext(name)
+            digest = hashlib.sha256(body).hexdigest()[:10]
+            hashed = f"{stem}.{digest}{ext}"
+
+            asset = Asset(body, _content_type(name), CACHE_IMMUTABLE,
+                          ext.lower() in COMPRESSIBLE_EXTENSIONS)
+            self.hashed_names[name] = hashed
+            self.routes[hashed] = asset
+            self.routes[name] = asset.with_cache_control(CACHE_REVALIDATE)
+
+        if self.entry in names:
+            with open(os.path.join(root, self.entry), encoding="utf-8") as f:
+                html = f.read()
+            html = _LOCAL_REF_RE.sub(
+                lambda m: f'{m.group(1)}="{self.hashed_names.get(m.group(2), m.group(2))}"', html)
+            self.routes[self.entry] = Asset(html.encode("utf-8"), _content_type(self.entry),
+                                            CACHE_REVALIDATE, True)
+
+    def resolve(self, path):
+        """
+        Find the asset for a request path. Unknown extensionless paths fall
+        back to the entry page (client-side routing); unknown files are None.
+        """
+        asset = self.routes.get(path)
+        if asset is not None:
+            return asset
+        if os.path.splitext(path)[1]:
+            return None
+        return self.routes.get(self.entry)
+
+    def serve(self, path, request):
+        """Build the response for `path`, honouring If-None-Match and Accept-Encoding."""
+        asset = self.resolve(path)
+        if asset is None:
+            return Response("Not found", status=404, mimetype="text/plain")
+
+        headers = {
+            "ETag": asset.etag,
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if _etag_matches(request.headers.get("If-None-Match", ""), asset.etag):
+            return Response(status=304, headers=headers)
+
+        accepted = request.headers.get("Accept-Encoding", "")
+        body = asset.body
+        if asset.br is not None and "br" in accepted:
+            body = asset.br
+            headers["Content-Encoding"] = "br"
+        elif asset.gzip is not None and "gzip" in accepted:
+            body = asset.gzip
+            headers["Content-Encoding"] = "gzip"
+
+        headers["Content-Length"] = str(len(body))
+        return Response(body, headers=headers, content_type=asset.content_type, direct_passthrough=True)
+
+
+def _etag_matches(if_none_match, etag):
+    """
+    True if the If-None-Match list names `etag` or is *. Weak comparison
+    (RFC 9110 13.1.2): W/ prefixes are ignored on both sides.
+    """
+    etag = etag.removeprefix("W/")
+    return any(tag == "*" or tag.removeprefix("W/") == etag for tag in _ENTITY_TAG_RE.findall(if_none_match))
+
+
+def _content_type(name):
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type in ("application/javascript", "image/svg+xml"):
+        content_type += "; charset=utf-8"
+    return content_type
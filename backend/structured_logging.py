@@ -0,0 +1,147 @@
+"""
+Structured Logging - JSON log lines with request IDs, written off the request thread.
+Records go onto an in-memory queue; a background listener formats and writes them.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import uuid
+import zlib
+from contextvars import ContextVar
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Fraction of requests whose verbose debug fields (prompt/context slices) get logged
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.05"))
+
+# Request ID for the current request (propagates through the call chain automatically)
+request_id_var = ContextVar("request_id", default="-")
+
+_listener = None
+_queue = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as a single JSON line."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        elif record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp the caller's request ID onto the record before it leaves the thread."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that pre-renders the message and traceback but keeps extra fields."""
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def configure_logging():
+    """Install the queue handler on the `copygen` logger (idempotent)."""
+    global _listener, _queue
+    if _listener is not None:
+        return
+
+    _queue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+
+    handler = _QueueHandler(_queue)
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger("copygen")
+    root.setLevel(LOG_LEVEL)
+    root.handlers = [handler]
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush and stop the background listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def restart_listener():
+    """
+    Restart the listener thread in a forked worker. Threads don't survive
+    fork(), so a preloaded parent's listener is dead in the child.
+    """
+    global _listener
+    if _queue is None:
+        return
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(_queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def get_logger(name):
+    """Return a child of the `copygen` logger, configuring logging on first use."""
+    configure_logging()
+    return logging.getLogger(f"copygen.{name}")
+
+
+# ============ REQUEST IDS & SAMPLING ============
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def bind_request_id(request_id=None):
+    """Set the request ID for the current context. Returns the ID in use."""
+    request_id = request_id or new_request_id()
+    request_id_var.set(request_id)
+    return request_id
+
+
+def get_request_id():
+    return request_id_var.get()
+
+
+def should_sample():
+    """
+    Decide whether to log verbose fields for the current request.
+    Hash-based so every log line of a sampled request carries them.
+    """
+    if LOG_SAMPLE_RATE >= 1:
+        return True
+    if LOG_SAMPLE_RATE <= 0:
+        return False
+    return zlib.crc32(request_id_var.get().encode()) % 10000 < LOG_SAMPLE_RATE * 10000
+
@@ -0,0 +1,128 @@
+"""
+Validator - Rule checks and local repair for LLM-written variations.
+The prompt's hard rules (CTA question as the last body line, body under the
+word limit, no framework example brands, no client name in the body) are
+checked with a few precompiled regexes. Most breaks are fixed in place -
+trailing sign-offs dropped, a question CTA swapped in, offending or surplus
+sentences cut - so only the rest need another model call. The final batch,
+template variations swapped in included, goes through validate_variation.
+"""
+
+import os
+import random
+import re
+from functools import lru_cache
+
+from hooks import CTA_OPTIONS
+
+MAX_BODY_WORDS = int(os.getenv("MAX_BODY_WORDS", "50"))
+
+# Framework examples the prompt bans from LLM copy
+BANNED_NAMES = ("Cozy Earth", "Nike", "YSL", "BMW", "Microsoft")
+
+# Rule -> instruction sent when a variation has to be re-requested
+RULES = {
+    "cta_last_line": "End the body with a short CTA question on its own line - nothing after it.",
+    "word_count": f"Keep the body under {MAX_BODY_WORDS} words.",
+    "banned_name": f"Don't mention {', '.join(BANNED_NAMES)} anywhere.",
+    "client_name": "Don't mention the sender's company name in the body.",
+}
+
+QUESTION_CTAS = tuple(cta for cta in CTA_OPTIONS if cta.endswith("?"))
+# A statement standing where the CTA belongs ("Happy to share more.") is replaced, not kept
+_CTA_LEAD_RE = re.compile(r"^(happy to|let me know|want|open to|worth|should i|mind if|curious|would you)\b", re.I)
+_BANNED_RE = re.compile(r"\b(?:" + "|".join(map(re.escape, BANNED_NAMES)) + r")\b", re.I)
+_WORD_RE = re.compile(r"[\w'’]+")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+# Sign-off lines ("Best,", "{{sender_name}}") are at most this long
+_SIGN_OFF_WORDS = 3
+
+
+@lru_cache(maxsize=256)
+def _client_pattern(client_name):
+    client_name = (client_name or "").strip()
+    if not client_name:
+        return None
+    return re.compile(r"(?<!\w)" + re.escape(client_name) + r"(?!\w)", re.I)
+
+
+def _word_count(text):
+    return len(_WORD_RE.findall(text))
+
+
+def _is_question(line):
+    return line.rstrip().rstrip("\"'”").endswith("?")
+
+
+def check(variation, client_name=""):
+    """Names of the rules `variation` breaks (empty when it passes)."""
+    body = variation.get("body") or ""
+    violations = []
+    lines = [line for line in body.splitlines() if line.strip()]
+    if not lines or not _is_question(lines[-1]):
+        violations.append("cta_last_line")
+    if _word_count(body) > MAX_BODY_WORDS:
+        violations.append("word_count")
+    if any(_BANNED_RE.search(variation.get(field) or "") for field in ("subject", "body", "ps")):
+        violations.append("banned_name")
+    pattern = _client_pattern(client_name)
+    if pattern is not None and pattern.search(body):
+        violations.append("client_name")
+    return violations
+
+
+def _drop_sentences(text, pattern):
+    return " ".join(s for s in _SENTENCE_RE.split(text.strip()) if not pattern.search(s))
+
+
+def repair(variation, client_name="", rng=random):
+    """
+    Fix what can be fixed locally. The opener (first line) and subject are
+    never rewritten - a rule broken there needs the model. Returns
+    (repaired copy, rules still broken).
+    """
+    fixed = dict(variation)
+    lines = [line.strip() for line in (variation.get("body") or "").splitlines() if line.strip()]
+    if not lines:
+        return fixed, check(fixed, client_name)
+    client = _client_pattern(client_name)
+    names = [p for p in (_BANNED_RE, client) if p is not None]
+
+    # Sign-off lines trailing an otherwise final question
+    while len(lines) > 2 and not _is_question(lines[-1]) and _word_count(lines[-1]) <= _SIGN_OFF_WORDS \
+            and any(_is_question(line) for line in lines[1:-1]):
+        lines.pop()
+
+    # Sentences naming a banned brand or the client, outside the opener
+    opener, rest = lines[0], lines[1:]
+    for pattern in names:
+        rest = [_drop_sentences(line, pattern) for line in rest]
+    rest = [line for line in rest if line]
+
+    # Question CTA as the last line: replace a statement CTA, otherwise append one
+    if not rest or not _is_question(rest[-1]):
+        if rest and _CTA_LEAD_RE.match(rest[-1]):
+            rest.pop()
+        rest.append(rng.choice(QUESTION_CTAS))
+
+    # Over the word limit: cut middle sentences from the end
+    middle, cta = rest[:-1], rest[-1]
+    while middle and _word_count(" ".join([opener, *middle, cta])) > MAX_BODY_WORDS:
+        sentences = _SENTENCE_RE.split(middle[-1])
+        if len(sentences) > 1:
+            middle[-1] = " ".join(sentences[:-1])
+        else:
+            middle.pop()
+
+    fixed["body"] = "\n\n".join([opener, *middle, cta])
+    if fixed.get("ps") and _BANNED_RE.search(fixed["ps"]):
+        ps = _drop_sentences(fixed["ps"], _BANNED_RE)
+        fixed["ps"] = ps if _word_count(ps.replace("P.S.", "")) else ""
+    return fixed, check(fixed, client_name)
+
+
+def validate_variation(variation, client_name="", rng=random):
+    """check(), then repair() if anything is broken. Returns (variation, rules still broken)."""
+    if not check(variation, client_name):
+        return variation, []
+    return repair(variation, client_name, rng)
@@ -3,19 +3,32 @@ Website Analyzer - Scrapes and extracts relevant context from client websites.
 Used to enrich copy generation when strategy notes are light.
 """
 
+import hashlib
+import json
 import requests
 from bs4 import BeautifulSoup
 import re
+import time
 
+from context_cache import get_context_cache
+from deadline import MAX_SCRAPE_SECONDS, MIN_SCRAPE_SECONDS, degrade
+from metrics import inc, timer
+from parse_pool import PARSE_TIMEOUT, ParsePoolFull, parse_page
+from structured_logging import get_logger
 
-def analyze_website(url):
-    """
-    Fetch and analyze a website to extract relevant context for copy generation.
-    
-    Returns:
-        dict with extracted context like value_props, services, messaging, etc.
-    """
-    context = {
+log = get_logger("website_analyzer")
+
+# Head-only fast path: the page's own title/description/OpenGraph/JSON-LD, read
+# without parsing the body. Enough when it yields a headline and a real description.
+_BODY_RE = re.compile(r"<body[\s>]", re.I)
+_BODY_BYTES_RE = re.compile(rb"<body[\s>]", re.I)
+MIN_DESCRIPTION_CHARS = 40
+META_FIELDS = ("description", "og:title", "og:description", "og:site_name", "twitter:description")
+JSON_LD_TYPES = ("Organization", "Corporation", "LocalBusiness", "ProfessionalService", "Product", "Service")
+
+
+def _empty_context():
+    return {
         "value_props": [],
         "services": [],
         "messaging": "",
@@ -23,80 +36,266 @@ def analyze_website(url):
         "ctas": [],
         "raw_text": ""
     }
+
+
+def analyze_website(url, deadline=None):
+    """
+    Fetch and analyze a website to extract relevant context for copy generation.
+    A fresh entry in the context cache (see context_cache.py) is served without
+    fetching. Parsing runs in the parse pool (see parse_pool.py), off the
+    request thread. With a `deadline` (deadline.py) fetch and parse share its
+    time, and the page isn't fetched at all when too little is left.
+    
+    Returns:
+        dict with extracted context like value_props, services, messaging, etc.
+    """
+    context = _empty_context()
     
     if not url or url == "https://example.com":
         return context
     
+    cache = get_context_cache()
+    if cache is not None:
+        cached = cache.get(url)
+        if cached is not None:
+            inc("copygen_cache_hits_total", cache="website_context")
+            return cached
+        inc("copygen_cache_misses_total", cache="website_context")
+    
+    if deadline is not None and deadline.remaining() < MIN_SCRAPE_SECONDS:
+        degrade("skip_scrape")
+        log.warning("no time left to fetch website", extra={"fields": {
+            "url": url, "remaining": round(deadline.remaining(), 2)}})
+        return context
+    
     try:
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
-        }
-        response = requests.get(url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style", "nav", "footer", "header"]):
-            script.decompose()
-        
-        # Extract hero/headline content
-        headlines = []
-        for tag in soup.find_all(['h1', 'h2', 'h3']):
-            text = tag.get_text(strip=True)
-            if text and len(text) > 10 and len(text) < 200:
-                headlines.append(text)
-        
-        # Extract value propositions from common patterns
-        for tag in soup.find_all(['p', 'li', 'span', 'div']):
-            text = tag.get_text(strip=True)
-            # Look for value prop language
-            if any(kw in text.lower() for kw in ['we help', 'we offer', 'we provide', 'our mission', 
-                                                   'benefit', 'advantage', 'why choose', 'what we do']):
-                if 20 < len(text) < 300:
-                    context["value_props"].append(text)
-        
-        # Extract social proof (numbers, client mentions)
-        for tag in soup.find_all(['p', 'span', 'div', 'li']):
-            text = tag.get_text(strip=True)
-            # Look for social proof patterns
-            if re.search(r'\d+[\+]?\s*(clients|customers|companies|businesses|years|deals|transactions)', text.lower()):
-                if len(text) < 200:
-                    context["social_proof"].append(text)
-        
-        # Extract CTAs
-        for button in soup.find_all(['button', 'a']):
-            text = button.get_text(strip=True)
-            if any(kw in text.lower() for kw in ['schedule', 'book', 'contact', 'get started', 
-                                                   'learn more', 'talk to', 'free consultation']):
-                if 3 < len(text) < 50:
-                    context["ctas"].append(text)
-        
-        # Get main body text (limited)
-        body_text = soup.get_text(separator=' ', strip=True)
-        # Clean up whitespace
-        body_text = re.sub(r'\s+', ' ', body_text)
-        # Limit to first 2000 chars for context
-        context["raw_text"] = body_text[:2000]
-        
-        # Store headlines as messaging
-        context["messaging"] = " | ".join(headlines[:5])
-        
-        # Deduplicate
-        context["value_props"] = list(set(context["value_props"]))[:5]
-        context["social_proof"] = list(set(context["social_proof"]))[:3]
-        context["ctas"] = list(set(context["ctas"]))[:3]
-        
-        print(f"📊 Analyzed website: {len(headlines)} headlines, {len(context['value_props'])} value props")
+        context, changed = fetch_context(url, cache, deadline)
+        log.info("website analyzed", extra={"fields": {
+            "url": url, "changed": changed, "value_props": len(context["value_props"])}})
         
     except requests.RequestException as e:
-        print(f"⚠️ Could not fetch website: {e}")
+        log.warning("could not fetch website", extra={"fields": {"url": url, "error": str(e)}})
+    except ParsePoolFull as e:
+        log.warning("parse pool saturated, skipping website context", extra={"fields": {"url": url, "error": str(e)}})
     except Exception as e:
-        print(f"⚠️ Error analyzing website: {e}")
+        log.warning("error analyzing website", extra={"fields": {"url": url, "error": str(e)}})
     
     return context
 
 
+def fetch_context(url, cache=None, deadline=None):
+    """
+    Fetch `url` and extract its context, storing it in `cache` when given.
+    If the page bytes hash the same as the cached entry, extraction is
+    skipped and the entry just renewed. Returns (context, changed); fetch
+    and parse errors (including timeouts) propagate.
+    """
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"
+    }
+    timeout = MAX_SCRAPE_SECONDS if deadline is None else min(MAX_SCRAPE_SECONDS, deadline.remaining())
+    with timer("fetch"):
+        response = requests.get(url, headers=headers, timeout=timeout)
+        response.raise_for_status()
+    
+    content_hash = hashlib.sha256(response.content).hexdigest()
+    entry = cache.entry(url) if cache is not None else None
+    if entry is not None and entry["content_hash"] == content_hash:
+        cache.touch(url)
+        return entry["context"], False
+    
+    # Only trust a declared charset; otherwise let the parser sniff <meta charset>
+    content_type = response.headers.get("Content-Type", "").lower()
+    encoding = response.encoding if "charset=" in content_type else None
+    context = parse_page(response.content, encoding,
+                         PARSE_TIMEOUT if deadline is None else min(PARSE_TIMEOUT, deadline.remaining()))
+    if cache is not None:
+        cache.put(url, content_hash, context)
+    return context, True
+
+
+def extract_context(html, encoding=None, timings=None, head_first=True):
+    """
+    Parse raw page bytes (or text) and extract the copy-relevant context.
+    Pure and picklable so it can run in a worker process; when `timings` is
+    a dict, the head/parse/extract durations (seconds) are stored in it.
+    
+    With `head_first`, the document head is parsed on its own first; when
+    its metadata is sufficient (see extract_head_context) the body is never
+    parsed. Otherwise the full pass runs and the metadata leads its results.
+    """
+    head_context = None
+    if head_first:
+        start = time.perf_counter()
+        head_context = extract_head_context(html, encoding)
+        if timings is not None:
+            timings["head"] = time.perf_counter() - start
+        if head_context is not None and _head_sufficient(head_context):
+            return head_context
+    
+    context = _empty_context()
+    
+    start = time.perf_counter()
+    if isinstance(html, bytes):
+        soup = BeautifulSoup(html, 'html.parser', from_encoding=encoding)
+    else:
+        soup = BeautifulSoup(html, 'html.parser')
+    
+    # Remove script and style elements
+    for script in soup(["script", "style", "nav", "footer", "header"]):
+        script.decompose()
+    parsed = time.perf_counter()
+    
+    # Extract hero/headline content
+    headlines = []
+    for tag in soup.find_all(['h1', 'h2', 'h3']):
+        text = tag.get_text(strip=True)
+        if text and len(text) > 10 and len(text) < 200:
+            headlines.append(text)
+    
+    # Extract value propositions from common patterns
+    for tag in soup.find_all(['p', 'li', 'span', 'div']):
+        text = tag.get_text(strip=True)
+        # Look for value prop language
+        if any(kw in text.lower() for kw in ['we help', 'we offer', 'we provide', 'our mission', 
+                                               'benefit', 'advantage', 'why choose', 'what we do']):
+            if 20 < len(text) < 300:
+                context["value_props"].append(text)
+    
+    # Extract social proof (numbers, client mentions)
+    for tag in soup.find_all(['p', 'span', 'div', 'li']):
+        text = tag.get_text(strip=True)
+        # Look for social proof patterns
+        if re.search(r'\d+[\+]?\s*(clients|customers|companies|businesses|years|deals|transactions)', text.lower()):
+            if len(text) < 200:
+                context["social_proof"].append(text)
+    
+    # Extract CTAs
+    for button in soup.find_all(['button', 'a']):
+        text = button.get_text(strip=True)
+        if any(kw in text.lower() for kw in ['schedule', 'book', 'contact', 'get started', 
+                                               'learn more', 'talk to', 'free consultation']):
+            if 3 < len(text) < 50:
+                context["ctas"].append(text)
+    
+    # Get main body text (limited)
+    body_text = soup.get_text(separator=' ', strip=True)
+    # Clean up whitespace
+    body_text = re.sub(r'\s+', ' ', body_text)
+    # Limit to first 2000 chars for context
+    context["raw_text"] = body_text[:2000]
+    
+    # Store headlines as messaging
+    context["messaging"] = " | ".join(headlines[:5])
+    
+    # Deduplicate
+    context["value_props"] = list(set(context["value_props"]))[:5]
+    context["social_proof"] = list(set(context["social_proof"]))[:3]
+    context["ctas"] = list(set(context["ctas"]))[:3]
+    
+    if head_context is not None:
+        _merge_head_context(context, head_context)
+    
+    if timings is not None:
+        timings["parse"] = parsed - start
+        timings["extract"] = time.perf_counter() - parsed
+    return context
+
+
+def _head_of(html):
+    """Everything before <body> (None when the page has no body tag to stop at)."""
+    match = (_BODY_BYTES_RE if isinstance(html, bytes) else _BODY_RE).search(html)
+    return html[:match.start()] if match else None
+
+
+def _json_ld_entities(soup):
+    """Organization/Product-like JSON-LD objects in the head, @graph and lists flattened."""
+    found = []
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        stack = data if isinstance(data, list) else [data]
+        while stack:
+            item = stack.pop(0)
+            if not isinstance(item, dict):
+                continue
+            stack.extend(item.get("@graph") or [])
+            types = item.get("@type")
+            types = types if isinstance(types, list) else [types]
+            if any(t in JSON_LD_TYPES for t in types):
+                found.append(item)
+    return found
+
+
+def _unique(values):
+    return list(dict.fromkeys(v.strip() for v in values if isinstance(v, str) and v.strip()))
+
+
+def extract_head_context(html, encoding=None):
+    """
+    Context from the document head alone: <title>, meta description,
+    OpenGraph and JSON-LD Organization/Product data. Headlines, slogans go to
+    messaging, descriptions to value_props, offers to services and an
+    aggregateRating to social_proof. None when there's no <body> to stop at.
+    """
+    head = _head_of(html)
+    if head is None:
+        return None
+    if isinstance(head, bytes):
+        soup = BeautifulSoup(head, 'html.parser', from_encoding=encoding)
+    else:
+        soup = BeautifulSoup(head, 'html.parser')
+    
+    meta = {}
+    for tag in soup.find_all("meta"):
+        key = (tag.get("property") or tag.get("name") or "").lower()
+        if key in META_FIELDS and tag.get("content") and key not in meta:
+            meta[key] = tag["content"]
+    entities = _json_ld_entities(soup)
+    title = soup.title.get_text(strip=True) if soup.title else ""
+    
+    headlines = _unique([meta.get("og:title") or title] + [e.get("slogan") for e in entities])
+    descriptions = _unique([meta.get("description"), meta.get("og:description"), meta.get("twitter:description")]
+                           + [e.get("description") for e in entities])
+    services = []
+    social_proof = []
+    for entity in entities:
+        types = entity.get("@type") if isinstance(entity.get("@type"), list) else [entity.get("@type")]
+        if "Product" in types or "Service" in types:
+            services.append(entity.get("name"))
+        offers = entity.get("makesOffer") or []
+        for offer in offers if isinstance(offers, list) else [offers]:
+            item = offer.get("itemOffered") if isinstance(offer, dict) else None
+            services.append(item.get("name") if isinstance(item, dict) else None)
+        rating = entity.get("aggregateRating")
+        if isinstance(rating, dict) and rating.get("ratingValue"):
+            count = rating.get("reviewCount") or rating.get("ratingCount")
+            social_proof.append(f"Rated {rating['ratingValue']}/{rating.get('bestRating', 5)}"
+                                + (f" from {count} reviews" if count else ""))
+    
+    context = _empty_context()
+    context["messaging"] = " | ".join(headlines[:5])
+    context["value_props"] = [d for d in descriptions if 20 < len(d) < 300][:5]
+    context["services"] = _unique(services)[:5]
+    context["social_proof"] = social_proof[:3]
+    context["raw_text"] = " ".join(_unique([meta.get("og:site_name"), title] + headlines + descriptions))[:2000]
+    return context
+
+
+def _head_sufficient(context):
+    """A headline plus at least one real description - enough to skip the body."""
+    return bool(context["messaging"]) and any(len(v) >= MIN_DESCRIPTION_CHARS for v in context["value_props"])
+
+
+def _merge_head_context(context, head_context):
+    """Put what the head did have ahead of the full pass's keyword matches."""
+    context["messaging"] = " | ".join(m for m in (head_context["messaging"], context["messaging"]) if m)
+    for key, limit in (("value_props", 5), ("services", 5), ("social_proof", 3)):
+        context[key] = _unique(head_context[key] + context[key])[:limit]
+
+
 def format_website_context(context):
     """
     Format the extracted website context into a string for the LLM prompt.
@@ -14,7 +14,8 @@ const state = {
         strategy: ''
     },
     variations: [],         // Stores the 4 generated variations
-    activeVariation: 0      // Currently displayed variation index
+    activeVariation: 0,     // Currently displayed variation index
+    sessionId: newSessionId() // Ties the website prefetch to the later generate call
 };
 
 const steps = [
@@ -278,6 +279,8 @@ function attachListeners() {
     const btnNext = document.getElementById('btn-next');
     if (btnNext) {
         btnNext.addEventListener('click', () => {
+            // Start scraping the site while the strategy notes are written
+            if (state.step === 1) prefetchWebsite();
             state.step++;
             render();
         });
@@ -376,7 +379,8 @@ async function startSynthesis() {
                 industry: state.data.onboarding.industry,
                 audience: state.data.onboarding.audience,
                 website: state.data.website,
-                strategy: state.data.strategy
+                strategy: state.data.strategy,
+                sessionId: state.sessionId
             })
         });
 
@@ -401,6 +405,20 @@ async function startSynthesis() {
     }
 }
 
+function newSessionId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Math.random().toString(36).slice(2) + Date.now().toString(36);
+}
+
+// Fire-and-forget: generation scrapes the site itself if this never lands
+function prefetchWebsite() {
+    fetch(`${API_URL}/prefetch`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ website: state.data.website, sessionId: state.sessionId })
+    }).catch(() => {});
+}
+
 function sleep(ms) {
     return new Promise(resolve => setTimeout(resolve, ms));
 }
@@ -3,17 +3,24 @@ Simple static file server for Railway deployment.
 Serves the frontend HTML/CSS/JS files.
 """
 import os
-from flask import Flask, send_from_directory
+import sys
+from flask import Flask, request
 
-app = Flask(__name__, static_folder='.')
+# The asset manifest lives with the backend modules
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'backend'))
+from static_assets import AssetManifest  # noqa: E402
+
+app = Flask(__name__, static_folder=None)
+assets = AssetManifest(ROOT_DIR)
 
 @app.route('/')
 def index():
-    return send_from_directory('.', 'index.html')
+    return assets.serve('index.html', request)
 
 @app.route('/<path:path>')
 def static_files(path):
-    return send_from_directory('.', path)
+    return assets.serve(path, request)
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 3000))